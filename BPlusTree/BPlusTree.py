@@ -1,4 +1,17 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
 import math
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+from collections import Counter
+from operator import itemgetter
 
 # Node class representing each node in the B+ tree
 # Here, we define the Node structure
@@ -7,67 +20,763 @@ import math
 # keys: list of keys in the node
 # values: list of values (only for leaf nodes)
 # children: list of child nodes (only for internal nodes)
+# Nodes use __slots__ (no per-instance __dict__). In compact mode the keys of
+# a leaf are stored in an array('q') of 64-bit integers instead of a list.
 class Node:
-    def __init__(self, order):
+    __slots__ = ("order", "leaf", "keys", "values", "children", "next")
+
+    def __init__(self, order, compact=False):
         self.order = order
         self.leaf = True
-        self.keys = []
+        self.keys = array("q") if compact else []
         self.values = []
         self.children = []
         self.next = None
 
+
+# In compact mode a leaf stores each value directly instead of wrapping it
+# in a list; only keys with several values get a _Duplicates list, so unique
+# keys don't pay for one list each. search() and the iterators still return
+# a list of values per key in both modes.
+class _Duplicates(list):
+    __slots__ = ()
+
+
+# In lazy_delete mode remove() only replaces the value slot of the key with
+# this marker; the key stays in its leaf until compact_step() reaches that leaf.
+_TOMBSTONE = object()
+
+
+# Batches may be lists or NumPy arrays; tolist() also turns NumPy scalars
+# into plain ints, which compare and hash like the keys already stored.
+def _as_list(seq):
+    return seq.tolist() if hasattr(seq, "tolist") else list(seq)
+
+
+def _common_prefix_len(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+# Shortest separator s with left < s <= right (suffix truncation): for str,
+# bytes and tuple keys, the shortest prefix of right that is still greater
+# than left; a tuple element that tells them apart is truncated the same way.
+# Any other key type (int) is returned unchanged.
+def _shortest_separator(left, right):
+    if isinstance(right, (bytes, str)) and type(left) is type(right):
+        return right[:_common_prefix_len(left, right) + 1]
+    if isinstance(right, tuple) and isinstance(left, tuple):
+        n = _common_prefix_len(left, right)
+        if n < len(left):
+            return right[:n] + (_shortest_separator(left[n], right[n]),)
+        return right[:n + 1]
+    return right
+
+
+# Leaf key container for prefix_compression mode (str, bytes or tuple keys).
+# The keys of a leaf are sorted, so they all share the common prefix of the
+# first and last one: it is stored once and the list holds only the rest of
+# each key. Behaves like the list of full keys for everything the tree does
+# with leaf.keys (indexing, slicing, bisect, insert, pop, extend); a key that
+# doesn't share the prefix (a new first or last key) shortens it.
+class _PrefixKeys:
+    __slots__ = ("prefix", "suffixes")
+
+    def __init__(self, keys=()):
+        keys = list(keys)
+        self.prefix = keys[0][:_common_prefix_len(keys[0], keys[-1])] if keys else None
+        n = len(self.prefix) if keys else 0
+        self.suffixes = [k[n:] for k in keys]
+
+    def _suffix(self, key):
+        prefix = self.prefix
+        if prefix is None:
+            self.prefix = prefix = key
+        elif key[:len(prefix)] != prefix:
+            n = _common_prefix_len(prefix, key)
+            rest = prefix[n:]
+            self.suffixes = [rest + s for s in self.suffixes]
+            self.prefix = prefix = prefix[:n]
+        return key[len(prefix):]
+
+    def __len__(self):
+        return len(self.suffixes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            prefix = self.prefix
+            return _PrefixKeys([prefix + s for s in self.suffixes[i]])
+        return self.prefix + self.suffixes[i]
+
+    def __iter__(self):
+        prefix = self.prefix
+        for s in self.suffixes:
+            yield prefix + s
+
+    def __add__(self, other):
+        return _PrefixKeys([*self, *other])
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def insert(self, i, key):
+        suffix = self._suffix(key)
+        self.suffixes.insert(i, suffix)
+
+    def append(self, key):
+        suffix = self._suffix(key)
+        self.suffixes.append(suffix)
+
+    def extend(self, keys):
+        for key in keys:
+            self.append(key)
+
+    def pop(self, i=-1):
+        return self.prefix + self.suffixes.pop(i)
+
+    # bisect on the suffixes: a key that doesn't start with the prefix
+    # sorts before or after every key of the leaf
+    def bisect_left(self, key):
+        prefix = self.prefix
+        if prefix is None:
+            return 0
+        n = len(prefix)
+        head = key[:n]
+        if head == prefix:
+            return bisect_left(self.suffixes, key[n:])
+        return 0 if head < prefix else len(self.suffixes)
+
+    def bisect_right(self, key):
+        prefix = self.prefix
+        if prefix is None:
+            return 0
+        n = len(prefix)
+        head = key[:n]
+        if head == prefix:
+            return bisect_right(self.suffixes, key[n:])
+        return 0 if head < prefix else len(self.suffixes)
+
+
+# Snapshots (save/load): the tree is written as flat arrays, one page per
+# node, numbered in BFS order. All leaves are at the same depth, so they are
+# the last pages, left to right: leaf i is followed by page i + 1, and the
+# children of an internal node are consecutive pages starting at its
+# first_child.
+#   header       : see SNAPSHOT_HEADER; then (offset, length) of each section
+#   key_offsets  : node_count + 1 u64, start of each node's keys in "keys"
+#   keys         : int64 keys (flag _SNAP_INT_KEYS) or one pickled list per node
+#   first_child  : int64 per internal node
+#   value_offsets: leaf_count + 1 u64, start of each leaf's values in "values"
+#   values       : one pickled list per leaf with the list of values of each
+#                  key (None for a tombstone)
+# load() maps the file and returns a tree whose root is a stub node: a
+# node's fields are read from the map the first time one of them is
+# accessed, so loading doesn't depend on the size of the tree.
+SNAPSHOT_MAGIC = b"BPTS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SECTIONS = ("key_offsets", "keys", "first_child", "value_offsets", "values")
+# magic, version, flags, order, node_count, first_leaf, tombstones, sections
+SNAPSHOT_HEADER = struct.Struct("<4sHHIqqq" + "qq" * len(SNAPSHOT_SECTIONS))
+_SNAP_COMPACT, _SNAP_LAZY_DELETE, _SNAP_PREFIX, _SNAP_INT_KEYS = 1, 2, 4, 8
+
+
+def _snapshot_keys(nodes):
+    # all keys as one int64 array when they fit, else one pickle per node
+    try:
+        keys = array("q")
+        offsets = array("Q", [0])
+        for n in nodes:
+            keys.extend(n.keys)
+            offsets.append(len(keys))
+        return True, offsets, keys
+    except (TypeError, OverflowError):
+        blobs = [pickle.dumps(list(n.keys), pickle.HIGHEST_PROTOCOL) for n in nodes]
+        return False, _blob_offsets(blobs), b"".join(blobs)
+
+
+def _blob_offsets(blobs):
+    offsets = array("Q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return offsets
+
+
+def _write_sections(path, header, fields, sections):
+    # sections 8-byte aligned after the header; written to a temporary file
+    # and renamed, so a crash never leaves a half-written snapshot
+    layout = []
+    offset = header.size
+    for data in sections:
+        offset += -offset % 8
+        size = memoryview(data).nbytes
+        layout += [offset, size]
+        offset += size
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.pack(*fields, *layout))
+        for data, start in zip(sections, layout[::2]):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _lazy_node(self, name):
+    # __getattr__ of the stub nodes: only called for a field that isn't set
+    pages = self._pages
+    if pages is None:
+        raise AttributeError(name)
+    pages.materialize(self)
+    return getattr(self, name)
+
+
+_lazy_classes = {}
+
+
+# Stub version of a node class: same slots plus the snapshot and page
+def _lazy_node_class(node_class):
+    cls = _lazy_classes.get(node_class)
+    if cls is None:
+        cls = _lazy_classes[node_class] = type(
+            "Lazy" + node_class.__name__, (node_class,),
+            {"__slots__": ("_pages", "_page", "__weakref__"), "__getattr__": _lazy_node})
+    return cls
+
+
+# An open snapshot: the map, views of its sections and the stubs handed out
+# (weakly, so a node dropped by the tree is not kept alive).
+class _Snapshot:
+    def __init__(self, path, node_class):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < SNAPSHOT_HEADER.size:
+            raise ValueError(f"{path}: arquivo curto demais para um snapshot")
+        magic, version, flags, order, node_count, first_leaf, tombstones, *layout = \
+            SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path}: não é um snapshot de BPlusTree")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path}: versão de snapshot {version} não suportada")
+        view = memoryview(self.map)
+        sections = {name: view[start:start + size]
+                    for name, start, size in zip(SNAPSHOT_SECTIONS, layout[::2], layout[1::2])}
+        self.order = order
+        self.flags = flags
+        self.node_count = node_count
+        self.first_leaf = first_leaf
+        self.tombstones = tombstones
+        self.int_keys = bool(flags & _SNAP_INT_KEYS)
+        self.key_offsets = sections["key_offsets"].cast("Q")
+        self.keys = sections["keys"].cast("q") if self.int_keys else sections["keys"]
+        self.first_child = sections["first_child"].cast("q")
+        self.value_offsets = sections["value_offsets"].cast("Q")
+        self.values = sections["values"]
+        self.tree = None
+        self.node_class = _lazy_node_class(node_class)
+        self.slots = [s for c in node_class.__mro__ for s in getattr(c, "__slots__", ()) if s != "leaf"]
+        self.stubs = weakref.WeakValueDictionary()
+        self.lock = threading.Lock()
+
+    def node(self, page):
+        stub = self.stubs.get(page)
+        if stub is None:
+            stub = self.node_class.__new__(self.node_class)
+            stub._pages = self
+            stub._page = page
+            self.stubs[page] = stub
+        return stub
+
+    # Fills a stub from its page. Each field is set once, already with its
+    # final value and "leaf" last, so a concurrent reader
+    # (ConcurrentBPlusTree) either sees the final value or waits here.
+    def materialize(self, stub):
+        with self.lock:
+            if stub._pages is None:
+                return
+            page = stub._page
+            tree = self.tree
+            a, b = self.key_offsets[page], self.key_offsets[page + 1]
+            node = tree.node_class(self.order, tree.compact)
+            if page < self.first_leaf:
+                node.leaf = False
+                node.keys = self.keys[a:b].tolist() if self.int_keys else pickle.loads(self.keys[a:b])
+                first = self.first_child[page]
+                node.children = [self.node(c) for c in range(first, first + len(node.keys) + 1)]
+            else:
+                if self.int_keys and tree.compact:
+                    node.keys.frombytes(self.keys[a:b].cast("B"))
+                else:
+                    keys = self.keys[a:b].tolist() if self.int_keys else pickle.loads(self.keys[a:b])
+                    node.keys = _PrefixKeys(keys) if tree.prefix_compression else keys
+                leaf = page - self.first_leaf
+                values = pickle.loads(self.values[self.value_offsets[leaf]:self.value_offsets[leaf + 1]])
+                node.values = [
+                    _TOMBSTONE if v is None
+                    else v if not tree.compact
+                    else v[0] if len(v) == 1 else _Duplicates(v)
+                    for v in values]
+                node.next = self.node(page + 1) if page + 1 < self.node_count else None
+            for name in self.slots:
+                setattr(stub, name, getattr(node, name))
+            stub.leaf = node.leaf
+            stub._pages = None
+
+
 # all the methods of BPlusTree class
 # The methods use an interative approach to avoid recursion depth issues
 # The BPlusTree supports insertion and search operations
 class BPlusTree:
-    def __init__(self, order: int):
-        self.root = Node(order)
+    # a key holds a list of values: insert() appends and search() returns the list
+    multi_value = True
+    # class used for every node the tree creates (subclasses add fields to it)
+    node_class = Node
+
+    def __init__(self, order: int, compact: bool = False, lazy_delete: bool = False,
+                 prefix_compression: bool = False):
+        self.compact = compact
+        self.lazy_delete = lazy_delete
+        self.prefix_compression = prefix_compression
+        # searches inside leaves (the internal nodes always hold plain lists)
+        if prefix_compression:
+            self._bisect_left, self._bisect_right = _PrefixKeys.bisect_left, _PrefixKeys.bisect_right
+        else:
+            self._bisect_left, self._bisect_right = bisect_left, bisect_right
+        self.tombstones = 0
+        self._compact_cursor = None
+        # Counter of events (descents, nodes visited, splits, ...) while
+        # enabled by enable_counters(); None costs one check per operation
+        self.counters = None
+        self.root = self._new_leaf(order)
+
+    def enable_counters(self):
+        self.counters = Counter()
+        return self.counters
+
+    def disable_counters(self):
+        self.counters = None
+
+    # Counts one node of the descent an operation is making (called inline,
+    # only while counters are enabled); reaching the leaf ends the descent.
+    # Bisect runs in C, so the comparisons are estimated as ceil(log2(n + 1))
+    # for a node with n keys.
+    def _count_node(self, node):
+        counters = self.counters
+        counters["nodes_visited"] += 1
+        counters["comparisons"] += len(node.keys).bit_length()
+        if node.leaf:
+            counters["descents"] += 1
+
+    # empty leaf; in prefix_compression mode its keys go in a _PrefixKeys
+    def _new_leaf(self, order):
+        leaf = self.node_class(order, self.compact)
+        if self.prefix_compression:
+            leaf.keys = _PrefixKeys()
+        return leaf
+
+    # leaf slot for the first value of a key
+    def _new_value(self, value):
+        return value if self.compact else [value]
+
+    def _add_value(self, leaf, i, value):
+        stored = leaf.values[i]
+        if stored is _TOMBSTONE:
+            # a removed key comes back with only the new value
+            leaf.values[i] = self._new_value(value)
+            self.tombstones -= 1
+        elif not self.compact:
+            stored.append(value)
+        elif type(stored) is _Duplicates:
+            stored.append(value)
+        else:
+            leaf.values[i] = _Duplicates((stored, value))
+
+    # list of values for a leaf slot
+    def _values_of(self, stored):
+        if not self.compact or type(stored) is _Duplicates:
+            return stored
+        return [stored]
+
+    # Bulk-load: builds the tree bottom-up from (key, value) pairs already sorted by key.
+    # Leaves are packed up to fill_factor * order keys and chained through Node.next,
+    # then each internal level is built in a single pass over the level below it.
+    # Repeated keys are grouped into the same values list, like insert() does.
+    @classmethod
+    def from_sorted(cls, items, order: int, fill_factor: float = 1.0, compact: bool = False,
+                    prefix_compression: bool = False):
+        if not 0 < fill_factor <= 1:
+            raise ValueError("fill_factor deve estar em (0, 1]")
+
+        tree = cls(order, compact, prefix_compression=prefix_compression)
+        min_keys = math.ceil(order / 2) - 1
+        leaf_capacity = max(min_keys, 1, min(order, int(order * fill_factor)))
+
+        level = []
+        leaf = None
+        for key, value in items:
+            if leaf is not None:
+                last_key = leaf.keys[-1]
+                if key == last_key:
+                    tree._add_value(leaf, len(leaf.values) - 1, value)
+                    continue
+                if key < last_key:
+                    raise ValueError(f"entrada não ordenada: {key} depois de {last_key}")
+            if leaf is None or len(leaf.keys) >= leaf_capacity:
+                new_leaf = tree._new_leaf(order)
+                if leaf is not None:
+                    leaf.next = new_leaf
+                leaf = new_leaf
+                level.append(leaf)
+            leaf.keys.append(key)
+            leaf.values.append(tree._new_value(value))
+
+        if not level:
+            return tree
+        cls._balance_last_leaves(level, order, min_keys)
+
+        # (separator to the left of the subtree, node) for each node of the
+        # level being grouped; between leaves it is the shortest separator
+        level = [(n.keys[0] if i == 0 else _shortest_separator(level[i - 1].keys[-1], n.keys[0]), n)
+                 for i, n in enumerate(level)]
+        max_children = order + 1
+        min_children = min_keys + 1
+        fanout = max(min_children, 2, min(max_children, int(max_children * fill_factor)))
+        while len(level) > 1:
+            groups = [level[i:i + fanout] for i in range(0, len(level), fanout)]
+            if len(groups) > 1 and len(groups[-1]) < min_children:
+                merged = groups[-2] + groups.pop()
+                if len(merged) <= max_children:
+                    groups[-1] = merged
+                else:
+                    half = len(merged) // 2
+                    groups[-1] = merged[:half]
+                    groups.append(merged[half:])
+
+            parents = []
+            for group in groups:
+                parent = cls.node_class(order)
+                parent.leaf = False
+                parent.keys = [low for low, _ in group[1:]]
+                parent.children = [child for _, child in group]
+                parents.append((group[0][0], parent))
+            level = parents
+
+        tree.root = level[0][1]
+        return tree
+
+    @staticmethod
+    def _balance_last_leaves(leaves, order, min_keys):
+        # only the last leaf can end up under-filled: merge it into its left
+        # neighbour when both fit in one node, otherwise split the keys evenly
+        if len(leaves) < 2 or len(leaves[-1].keys) >= min_keys:
+            return
+        prev, last = leaves[-2], leaves[-1]
+        keys = prev.keys + last.keys
+        values = prev.values + last.values
+        if len(keys) <= order:
+            prev.keys, prev.values = keys, values
+            prev.next = None
+            leaves.pop()
+        else:
+            half = len(keys) // 2
+            prev.keys, prev.values = keys[:-half], values[:-half]
+            last.keys, last.values = keys[-half:], values[-half:]
+
+    # Bulk-load for unsorted input: an external merge sort in front of from_sorted.
+    # The input is cut into runs of run_size pairs, each run is sorted in memory and
+    # spilled to a temporary file, and the runs are merged lazily with heapq.merge.
+    @classmethod
+    def from_unsorted(cls, items, order: int, fill_factor: float = 1.0, run_size: int = 100_000,
+                      compact: bool = False, prefix_compression: bool = False):
+        if run_size <= 0:
+            raise ValueError("run_size deve ser > 0")
+
+        runs = []
+        try:
+            iterator = iter(items)
+            while True:
+                run = []
+                for pair in iterator:
+                    run.append(pair)
+                    if len(run) >= run_size:
+                        break
+                if not run:
+                    break
+                run.sort(key=itemgetter(0))
+                if not runs and len(run) < run_size:
+                    # everything fit in a single run, no need to touch the disk
+                    return cls.from_sorted(run, order, fill_factor, compact, prefix_compression)
+                runs.append(cls._spill_run(run))
+
+            merged = heapq.merge(*(cls._read_run(f) for f in runs), key=itemgetter(0))
+            return cls.from_sorted(merged, order, fill_factor, compact, prefix_compression)
+        finally:
+            for f in runs:
+                f.close()
+
+    @staticmethod
+    def _spill_run(run, block_size=4096):
+        f = tempfile.TemporaryFile()
+        for i in range(0, len(run), block_size):
+            pickle.dump(run[i:i + block_size], f, pickle.HIGHEST_PROTOCOL)
+        f.seek(0)
+        return f
 
-    def search(self, key: int):
+    @staticmethod
+    def _read_run(f):
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+    def search(self, key):
+        leaf = self._find_leaf(key)
+        i = self._bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key and leaf.values[i] is not _TOMBSTONE:
+            return self._values_of(leaf.values[i])
+        return None
+
+    # Descends once to the leaf where key is (or would be)
+    def _find_leaf(self, key):
+        counters = self.counters
         current = self.root
         while not current.leaf:
+            if counters is not None:
+                self._count_node(current)
+            current = current.children[bisect_right(current.keys, key)]
+        if counters is not None:
+            self._count_node(current)
+        return current
+
+    # Same descent, also returning the smallest separator to the right of the
+    # path: the leaf only holds keys < upper (None on the rightmost path).
+    # With parent_stack, records (node, child_index) like insert() does.
+    def _find_leaf_bounded(self, key, parent_stack=None):
+        counters = self.counters
+        current = self.root
+        upper = None
+        while not current.leaf:
+            if counters is not None:
+                self._count_node(current)
+            i = bisect_right(current.keys, key)
+            if i < len(current.keys):
+                upper = current.keys[i]
+            if parent_stack is not None:
+                parent_stack.append((current, i))
+            current = current.children[i]
+        if counters is not None:
+            self._count_node(current)
+        return current, upper
+
+    # Batched search: returns the results in the same order as keys (None for
+    # missing keys). The probes run in key order, so consecutive keys that fall
+    # in the same leaf reuse it instead of descending from the root again.
+    def search_many(self, keys):
+        keys = _as_list(keys)
+        results = [None] * len(keys)
+        leaf, upper = None, None
+        for pos in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[pos]
+            if leaf is None or (upper is not None and key >= upper):
+                leaf, upper = self._find_leaf_bounded(key)
+            leaf_keys = leaf.keys
+            i = self._bisect_left(leaf_keys, key)
+            if i < len(leaf_keys) and leaf_keys[i] == key and leaf.values[i] is not _TOMBSTONE:
+                results[pos] = self._values_of(leaf.values[i])
+        return results
+
+    def _first_leaf(self):
+        current = self.root
+        while not current.leaf:
+            current = current.children[0]
+        return current
+
+    # Leaves from right to left, starting at the leaf where key would be (or the
+    # last leaf when key is None). There are no back links between leaves, so
+    # this keeps the descent path on a stack: O(height) memory.
+    def _leaves_reversed(self, key=None):
+        stack = []
+        current = self.root
+        while True:
+            while not current.leaf:
+                i = len(current.keys) if key is None else bisect_right(current.keys, key)
+                stack.append((current, i))
+                current = current.children[i]
+            yield current
+            key = None
+            while stack:
+                parent, i = stack.pop()
+                if i > 0:
+                    stack.append((parent, i - 1))
+                    current = parent.children[i - 1]
+                    break
+            else:
+                return
+
+    # Lazy range scan: yields (key, values) for lo <= key <= hi in key order.
+    # lo/hi = None leave that side unbounded; inclusive is a bool for both ends
+    # or a (lo_inclusive, hi_inclusive) pair. Only one root-to-leaf descent is
+    # made, the rest follows the leaf chain (Node.next).
+    def range(self, lo=None, hi=None, inclusive=True, reverse=False):
+        if isinstance(inclusive, bool):
+            lo_inclusive = hi_inclusive = inclusive
+        else:
+            lo_inclusive, hi_inclusive = inclusive
+        if reverse:
+            return self._range_reversed(lo, hi, lo_inclusive, hi_inclusive)
+        return self._range_forward(lo, hi, lo_inclusive, hi_inclusive)
+
+    def _range_forward(self, lo, hi, lo_inclusive, hi_inclusive):
+        if lo is None:
+            leaf = self._first_leaf()
             i = 0
-            while i < len(current.keys) and key >= current.keys[i]:
+        else:
+            leaf = self._find_leaf(lo)
+            i = self._bisect_left(leaf.keys, lo) if lo_inclusive else self._bisect_right(leaf.keys, lo)
+
+        while leaf is not None:
+            keys = leaf.keys
+            values = leaf.values
+            while i < len(keys):
+                k = keys[i]
+                if hi is not None and (k > hi or (k == hi and not hi_inclusive)):
+                    return
+                if values[i] is not _TOMBSTONE:
+                    yield k, self._values_of(values[i])
                 i += 1
-            current = current.children[i]
+            leaf = leaf.next
+            i = 0
 
-        for i, k in enumerate(current.keys):
-            if k == key:
-                return current.values[i]
-        return None
+    def _range_reversed(self, lo, hi, lo_inclusive, hi_inclusive):
+        first = True
+        for leaf in self._leaves_reversed(hi):
+            keys = leaf.keys
+            values = leaf.values
+            i = len(keys)
+            if first and hi is not None:
+                i = self._bisect_right(keys, hi) if hi_inclusive else self._bisect_left(keys, hi)
+            first = False
+            while i > 0:
+                i -= 1
+                k = keys[i]
+                if lo is not None and (k < lo or (k == lo and not lo_inclusive)):
+                    return
+                if values[i] is not _TOMBSTONE:
+                    yield k, self._values_of(values[i])
+
+    def items(self, reverse=False):
+        return self.range(reverse=reverse)
+
+    def keys(self, reverse=False):
+        for k, _ in self.range(reverse=reverse):
+            yield k
+
+    # Keys starting with prefix (str, bytes or tuple keys)
+    def prefix(self, prefix):
+        n = len(prefix)
+        for k, v in self.range(lo=prefix):
+            if k[:n] != prefix:
+                return
+            yield k, v
 
-    def insert(self, key: int, value: any):
+    # Number of distinct keys in the range; whole leaves are counted with len()
+    # and only the boundary leaves are searched (while there are tombstones,
+    # the keys are counted one by one instead)
+    def count_range(self, lo=None, hi=None, inclusive=True):
+        if self.tombstones:
+            return sum(1 for _ in self.range(lo, hi, inclusive))
+        if isinstance(inclusive, bool):
+            lo_inclusive = hi_inclusive = inclusive
+        else:
+            lo_inclusive, hi_inclusive = inclusive
+
+        if lo is None:
+            leaf = self._first_leaf()
+            i = 0
+        else:
+            leaf = self._find_leaf(lo)
+            i = self._bisect_left(leaf.keys, lo) if lo_inclusive else self._bisect_right(leaf.keys, lo)
+
+        total = 0
+        while leaf is not None:
+            keys = leaf.keys
+            if hi is not None and keys and (keys[-1] > hi or (keys[-1] == hi and not hi_inclusive)):
+                end = self._bisect_right(keys, hi) if hi_inclusive else self._bisect_left(keys, hi)
+                return total + max(0, end - i)
+            total += len(keys) - i
+            leaf = leaf.next
+            i = 0
+        return total
+
+    # parent_stack holds (node, child_index) pairs for the descent path, so
+    # splits and rebalancing know where each child sits without rescanning
+    # parent.children
+    def insert(self, key, value: any):
         root = self.root
 
         if len(root.keys) == 0:
             root.keys.append(key)
-            root.values.append([value])
+            root.values.append(self._new_value(value))
             return
 
+        counters = self.counters
         parent_stack = []
         current = root
         while not current.leaf:
-            parent_stack.append(current)
-            i = 0
-            while i < len(current.keys) and key >= current.keys[i]:
-                i += 1
+            if counters is not None:
+                self._count_node(current)
+            i = bisect_right(current.keys, key)
+            parent_stack.append((current, i))
             current = current.children[i]
+        if counters is not None:
+            self._count_node(current)
 
-        i = 0
-        while i < len(current.keys) and key > current.keys[i]:
-            i += 1
+        i = self._bisect_left(current.keys, key)
         if i < len(current.keys) and current.keys[i] == key:
-            current.values[i].append(value)
+            self._add_value(current, i, value)
         else:
             current.keys.insert(i, key)
-            current.values.insert(i, [value])
+            current.values.insert(i, self._new_value(value))
 
         if len(current.keys) > current.order:
             self._split_leaf(current, parent_stack)
 
+    # Batched insert of (key, value) pairs (a list or an (n, 2) array). The
+    # pairs are sorted by key (stable, so repeated keys keep their values in
+    # batch order) and inserted leaf by leaf: the descent is only repeated
+    # when a key leaves the current leaf's range or the leaf had to split.
+    def insert_many(self, pairs):
+        pairs = sorted(_as_list(pairs), key=itemgetter(0))
+        leaf = None
+        for key, value in pairs:
+            if len(self.root.keys) == 0:
+                self.insert(key, value)
+                continue
+            if leaf is None or (upper is not None and key >= upper):
+                parent_stack = []
+                leaf, upper = self._find_leaf_bounded(key, parent_stack)
+
+            i = self._bisect_left(leaf.keys, key)
+            if i < len(leaf.keys) and leaf.keys[i] == key:
+                self._add_value(leaf, i, value)
+            else:
+                leaf.keys.insert(i, key)
+                leaf.values.insert(i, self._new_value(value))
+
+            if len(leaf.keys) > leaf.order:
+                self._split_leaf(leaf, parent_stack)
+                leaf = None
+
     def _split_leaf(self, leaf, parent_stack):
+        if self.counters is not None:
+            self.counters["leaf_splits"] += 1
         mid = math.ceil(leaf.order / 2)
-        new_leaf = Node(leaf.order)
+        new_leaf = self.node_class(leaf.order, self.compact)
         new_leaf.leaf = True
 
         new_leaf.keys = leaf.keys[mid:]
@@ -78,33 +787,33 @@ class BPlusTree:
         new_leaf.next = leaf.next
         leaf.next = new_leaf
 
-        promoted_key = new_leaf.keys[0]
+        # suffix truncation: only as much of the key as needed to separate the halves
+        promoted_key = _shortest_separator(leaf.keys[-1], new_leaf.keys[0])
 
         if not parent_stack:
-            new_root = Node(leaf.order)
+            new_root = self.node_class(leaf.order)
             new_root.leaf = False
             new_root.keys = [promoted_key]
             new_root.children = [leaf, new_leaf]
             self.root = new_root
             return
 
-        parent = parent_stack.pop()
-        self._insert_in_parent(parent, new_leaf, promoted_key, parent_stack)
+        parent, index = parent_stack.pop()
+        self._insert_in_parent(parent, index, new_leaf, promoted_key, parent_stack)
 
-    def _insert_in_parent(self, parent, new_child, key, parent_stack):
-        i = 0
-        while i < len(parent.keys) and key > parent.keys[i]:
-            i += 1
-
-        parent.keys.insert(i, key)
-        parent.children.insert(i + 1, new_child)
+    # new_child is the right half of parent.children[index]
+    def _insert_in_parent(self, parent, index, new_child, key, parent_stack):
+        parent.keys.insert(index, key)
+        parent.children.insert(index + 1, new_child)
 
         if len(parent.keys) > parent.order:
             self._split_internal(parent, parent_stack)
 
     def _split_internal(self, node, parent_stack):
+        if self.counters is not None:
+            self.counters["internal_splits"] += 1
         mid = math.ceil(node.order / 2)
-        new_node = Node(node.order)
+        new_node = self.node_class(node.order)
         new_node.leaf = False
 
         promoted_key = node.keys[mid]
@@ -115,40 +824,45 @@ class BPlusTree:
         node.children = node.children[:mid + 1]
 
         if not parent_stack:
-            new_root = Node(node.order)
+            new_root = self.node_class(node.order)
             new_root.leaf = False
             new_root.keys = [promoted_key]
             new_root.children = [node, new_node]
             self.root = new_root
             return
 
-        parent = parent_stack.pop()
-        self._insert_in_parent(parent, new_node, promoted_key, parent_stack)
+        parent, index = parent_stack.pop()
+        self._insert_in_parent(parent, index, new_node, promoted_key, parent_stack)
+
+    def remove(self, key):
+        if self.lazy_delete:
+            return self._remove_lazy(key)
 
-    def remove(self, key: int):
+        counters = self.counters
         current = self.root
         parent_stack = []
 
         while not current.leaf:
-            parent_stack.append(current)
-            i = 0
-            while i < len(current.keys) and key >= current.keys[i]:
-                i += 1
+            if counters is not None:
+                self._count_node(current)
+            i = bisect_right(current.keys, key)
+            parent_stack.append((current, i))
             current = current.children[i]
+        if counters is not None:
+            self._count_node(current)
 
-        if key not in current.keys:
+        index = self._bisect_left(current.keys, key)
+        if index == len(current.keys) or current.keys[index] != key:
             return False
 
-        index = current.keys.index(key)
         current.keys.pop(index)
         current.values.pop(index)
         if parent_stack:
-            parent = parent_stack[-1]
-            child_index = parent.children.index(current)
+            parent, child_index = parent_stack[-1]
             if child_index > 0 and len(current.keys) > 0:
                 parent.keys[child_index - 1] = current.keys[0]
 
-        if current == self.root:
+        if current is self.root:
             if not current.leaf and len(current.children) > 0:
                 self.root = current.children[0]
             return True
@@ -159,12 +873,80 @@ class BPlusTree:
 
         return True
 
+    # lazy_delete mode: marks the key as removed, no restructuring
+    def _remove_lazy(self, key):
+        leaf = self._find_leaf(key)
+        i = self._bisect_left(leaf.keys, key)
+        if i == len(leaf.keys) or leaf.keys[i] != key or leaf.values[i] is _TOMBSTONE:
+            return False
+        leaf.values[i] = _TOMBSTONE
+        self.tombstones += 1
+        return True
+
+    # Incremental compaction for lazy_delete mode (compact_step, since
+    # self.compact is the node mode flag). Each call handles at most
+    # max_leaves leaves, resuming at a cursor (the separator where the next
+    # leaf to visit starts), so the cost of a call is bounded. For each leaf the
+    # tombstones are dropped (also from its sibling leaves, so that a borrow
+    # never moves them back), the separator to its left is tightened to its
+    # new first key and an under-full leaf is fixed with the usual borrow /
+    # merge (_rebalance). Returns True when a full pass has finished.
+    def compact_step(self, max_leaves: int = 64):
+        min_keys = math.ceil(self.root.order / 2) - 1
+        for _ in range(max_leaves):
+            cursor = self._compact_cursor
+            parent_stack = []
+            current = self.root
+            upper = None
+            while not current.leaf:
+                i = 0 if cursor is None else bisect_right(current.keys, cursor)
+                if i < len(current.keys):
+                    upper = current.keys[i]
+                parent_stack.append((current, i))
+                current = current.children[i]
+
+            self._purge_leaf(current)
+            revisit = False
+            if parent_stack:
+                parent, i = parent_stack[-1]
+                for j in (i - 1, i + 1):
+                    if 0 <= j < len(parent.children):
+                        self._purge_leaf(parent.children[j])
+                if i > 0 and len(current.keys) > 0:
+                    parent.keys[i - 1] = current.keys[0]
+                if len(current.keys) < min_keys:
+                    self._rebalance(current, parent_stack)
+                    # a borrow moves a single key: visit the leaf again
+                    revisit = len(current.keys) < min_keys
+
+            if revisit:
+                continue
+            # the next leaf starts at the separator right of this one
+            self._compact_cursor = upper
+            if upper is None:
+                return True
+        return False
+
+    def _purge_leaf(self, leaf):
+        values = leaf.values
+        if not any(v is _TOMBSTONE for v in values):
+            return
+        keep = [i for i, v in enumerate(values) if v is not _TOMBSTONE]
+        keys = leaf.keys
+        new_keys = keys[:0]  # same container type (list or array)
+        new_keys.extend(keys[i] for i in keep)
+        leaf.keys = new_keys
+        leaf.values = [values[i] for i in keep]
+        self.tombstones -= len(values) - len(keep)
+
     def _rebalance(self, node, parent_stack):
         if not parent_stack:
             return
+        counters = self.counters
+        if counters is not None:
+            counters["rebalances"] += 1
 
-        parent = parent_stack.pop()
-        index = parent.children.index(node)
+        parent, index = parent_stack.pop()
 
         left_sibling = parent.children[index - 1] if index > 0 else None
         right_sibling = parent.children[index + 1] if index + 1 < len(parent.children) else None
@@ -172,42 +954,192 @@ class BPlusTree:
         min_keys = math.ceil(node.order / 2) - 1
 
         if left_sibling and len(left_sibling.keys) > min_keys:
-            borrowed_key = left_sibling.keys.pop(-1)
-            borrowed_value = left_sibling.values.pop(-1)
-            node.keys.insert(0, borrowed_key)
-            node.values.insert(0, borrowed_value)
-            parent.keys[index - 1] = node.keys[0]
+            if counters is not None:
+                counters["borrows"] += 1
+            if node.leaf:
+                node.keys.insert(0, left_sibling.keys.pop(-1))
+                node.values.insert(0, left_sibling.values.pop(-1))
+                parent.keys[index - 1] = node.keys[0]
+            else:
+                # internal nodes rotate through the separator in the parent
+                node.keys.insert(0, parent.keys[index - 1])
+                node.children.insert(0, left_sibling.children.pop(-1))
+                parent.keys[index - 1] = left_sibling.keys.pop(-1)
             return
 
         if right_sibling and len(right_sibling.keys) > min_keys:
-            borrowed_key = right_sibling.keys.pop(0)
-            borrowed_value = right_sibling.values.pop(0)
-            node.keys.append(borrowed_key)
-            node.values.append(borrowed_value)
-            parent.keys[index] = right_sibling.keys[0]
+            if counters is not None:
+                counters["borrows"] += 1
+            if node.leaf:
+                node.keys.append(right_sibling.keys.pop(0))
+                node.values.append(right_sibling.values.pop(0))
+                parent.keys[index] = right_sibling.keys[0]
+            else:
+                node.keys.append(parent.keys[index])
+                node.children.append(right_sibling.children.pop(0))
+                parent.keys[index] = right_sibling.keys.pop(0)
             return
 
         if left_sibling:
-            left_sibling.keys.extend(node.keys)
-            left_sibling.values.extend(node.values)
-            left_sibling.next = node.next
-            parent.children.pop(index)
-            parent.keys.pop(index - 1)
-            if index - 1 > 0:
-                parent.keys[index - 2] = left_sibling.keys[0]
+            self._merge(left_sibling, node, parent, index - 1)
         elif right_sibling:
-            node.keys.extend(right_sibling.keys)
-            node.values.extend(right_sibling.values)
-            node.next = right_sibling.next
-            parent.children.pop(index + 1)
-            parent.keys.pop(index)
-            if index > 0:
-                parent.keys[index - 1] = node.keys[0]
+            self._merge(node, right_sibling, parent, index)
+
+        if parent is self.root:
+            if len(parent.keys) == 0:
+                self.root = parent.children[0]
+            return
 
-        min_parent_keys = 1 if parent == self.root else math.ceil(parent.order / 2) - 1
-        if len(parent.keys) < min_parent_keys:
+        if len(parent.keys) < min_keys:
             self._rebalance(parent, parent_stack)
 
+    # Moves everything from right into left; parent.keys[sep_index] is the
+    # separator between them (pulled down when merging internal nodes)
+    def _merge(self, left, right, parent, sep_index):
+        if self.counters is not None:
+            self.counters["merges"] += 1
+        if left.leaf:
+            left.keys.extend(right.keys)
+            left.values.extend(right.values)
+            left.next = right.next
+        else:
+            left.keys.append(parent.keys[sep_index])
+            left.keys.extend(right.keys)
+            left.children.extend(right.children)
+        parent.keys.pop(sep_index)
+        parent.children.pop(sep_index + 1)
+
+    # Memory report (bytes, via sys.getsizeof) of the tree structure: node
+    # objects, key containers, leaf value slots (lists/wrappers, not the user
+    # values themselves) and child lists. Used to compare default vs compact.
+    def memory_usage(self):
+        report = {
+            "mode": "compact" if self.compact else "default",
+            "prefix_compression": self.prefix_compression,
+            "nodes": 0,
+            "leaves": 0,
+            "keys": 0,
+            "node_bytes": 0,
+            "key_bytes": 0,
+            "value_bytes": 0,
+            "child_bytes": 0,
+            "tombstones": self.tombstones,
+        }
+        stack = [self.root]
+        while stack:
+            n = stack.pop()
+            report["nodes"] += 1
+            report["key_bytes"] += sys.getsizeof(n.keys)
+            if n.leaf:
+                report["leaves"] += 1
+                report["keys"] += len(n.keys)
+                # the unused children list is counted as part of the node
+                report["node_bytes"] += sys.getsizeof(n) + sys.getsizeof(n.children)
+                report["value_bytes"] += sys.getsizeof(n.values)
+                for v in n.values:
+                    if isinstance(v, list):
+                        report["value_bytes"] += sys.getsizeof(v)
+                if isinstance(n.keys, list):
+                    # a list only holds pointers, each key is a separate int object
+                    report["key_bytes"] += sum(sys.getsizeof(k) for k in n.keys)
+                elif isinstance(n.keys, _PrefixKeys):
+                    report["key_bytes"] += (sys.getsizeof(n.keys.prefix) + sys.getsizeof(n.keys.suffixes)
+                                            + sum(sys.getsizeof(k) for k in n.keys.suffixes))
+            else:
+                report["node_bytes"] += sys.getsizeof(n) + sys.getsizeof(n.values)
+                # int separators are the leaf key objects; other types are
+                # (truncated) copies of their own
+                report["key_bytes"] += sum(sys.getsizeof(k) for k in n.keys if not isinstance(k, int))
+                report["child_bytes"] += sys.getsizeof(n.children)
+                stack.extend(n.children)
+        report["total_bytes"] = (report["node_bytes"] + report["key_bytes"]
+                                 + report["value_bytes"] + report["child_bytes"])
+        return report
+
+    # Structural statistics (machine-readable): height, node counts, fill of
+    # leaves and internal nodes (average and a histogram with 10 bins of
+    # width 0.1, keyed by the lower bound), tombstones, memory and the
+    # counters when enabled. Walks the whole tree.
+    def stats(self):
+        order = self.root.order
+        height = 0
+        leaves = internal = keys = 0
+        leaf_fill = internal_fill = 0.0
+        histogram = [0] * 10
+        level = [self.root]
+        while level:
+            height += 1
+            next_level = []
+            for n in level:
+                fill = len(n.keys) / order
+                if n.leaf:
+                    leaves += 1
+                    keys += len(n.keys)
+                    leaf_fill += fill
+                    histogram[min(9, int(fill * 10))] += 1
+                else:
+                    internal += 1
+                    internal_fill += fill
+                    next_level.extend(n.children)
+            level = next_level
+        stats = {
+            "height": height,
+            "order": order,
+            "nodes": leaves + internal,
+            "leaves": leaves,
+            "internal_nodes": internal,
+            "keys": keys - self.tombstones,
+            "tombstones": self.tombstones,
+            "leaf_fill": leaf_fill / leaves,
+            "internal_fill": internal_fill / internal if internal else 0.0,
+            "leaf_fill_histogram": {f"{i / 10:.1f}": c for i, c in enumerate(histogram)},
+            "bytes": self.memory_usage()["total_bytes"],
+        }
+        if self.counters is not None:
+            stats["counters"] = dict(self.counters)
+        return stats
+
+    # Writes the tree to path as a snapshot (see SNAPSHOT_HEADER). Pages of a
+    # loaded tree that were never touched are read from its map on the way.
+    def save(self, path):
+        nodes = []
+        level = [self.root]
+        while level:
+            nodes.extend(level)
+            level = [c for n in level if not n.leaf for c in n.children]
+        first_leaf = next(i for i, n in enumerate(nodes) if n.leaf)
+
+        int_keys, key_offsets, keys = _snapshot_keys(nodes)
+        first_child = array("q")
+        child = 1
+        for n in nodes[:first_leaf]:
+            first_child.append(child)
+            child += len(n.children)
+        values = [pickle.dumps([None if v is _TOMBSTONE else list(self._values_of(v)) for v in leaf.values],
+                               pickle.HIGHEST_PROTOCOL)
+                  for leaf in nodes[first_leaf:]]
+
+        flags = ((_SNAP_COMPACT if self.compact else 0) | (_SNAP_LAZY_DELETE if self.lazy_delete else 0)
+                 | (_SNAP_PREFIX if self.prefix_compression else 0) | (_SNAP_INT_KEYS if int_keys else 0))
+        fields = (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags, self.root.order, len(nodes), first_leaf, self.tombstones)
+        _write_sections(path, SNAPSHOT_HEADER, fields,
+                        [key_offsets, keys, first_child, _blob_offsets(values), b"".join(values)])
+
+    # Opens a snapshot written by save(): maps the file and returns a tree
+    # holding only a stub root, so it answers queries right away and each
+    # node is read from its page the first time it is touched. The loaded
+    # tree can be changed like any other; the file is never written.
+    @classmethod
+    def load(cls, path):
+        snapshot = _Snapshot(path, cls.node_class)
+        flags = snapshot.flags
+        tree = cls(snapshot.order, bool(flags & _SNAP_COMPACT), bool(flags & _SNAP_LAZY_DELETE),
+                   bool(flags & _SNAP_PREFIX))
+        snapshot.tree = tree
+        tree.tombstones = snapshot.tombstones
+        tree.root = snapshot.node(0)
+        return tree
+
     def display(self):
         nodes = [self.root]
         level = 0
@@ -0,0 +1,254 @@
+import argparse
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from BPlusTree import BPlusTree, Node, _as_list
+
+
+# Node with a latch and a version counter. Writers take the latch
+# exclusively and bump the version both when they take it and when they
+# release it, so the version is odd while the node may be changing and
+# different after any change. Readers never take latches: they read the
+# version, read the node and check the version again (optimistic reads).
+class LatchedNode(Node):
+    __slots__ = ("latch", "version")
+
+    def __init__(self, order, compact=False):
+        super().__init__(order, compact)
+        self.latch = threading.Lock()
+        self.version = 0
+
+
+class _Restart(Exception):
+    pass
+
+
+# Thread-safe B+ tree: there is no tree-wide lock.
+# Readers (search, range, items, ...) descend with optimistic lock coupling:
+# the child's version is read before the parent's version is checked again,
+# and any change on the way restarts the descent from the root. Range scans
+# copy one leaf at a time and validate it the same way before yielding.
+#
+# insert() first descends like a reader and latches only the leaf: when the
+# leaf has room, that is the only latch taken. Otherwise it descends again
+# latching top-down (crabbing); a child with room for one more key can't
+# split, so the latches of all its ancestors are released at that point and
+# only the nodes a split can reach stay latched.
+#
+# remove() never merges or borrows: it latches the leaf and may leave it
+# under-filled (like DiskBPlusTree). Without merges, a leaf's key range only
+# changes when the leaf itself splits, so an unchanged version is enough to
+# know the leaf is still the right one for a key.
+#
+# display(), memory_usage(), stats() and the counters (enable_counters) are
+# not synchronized (use them when idle).
+class ConcurrentBPlusTree(BPlusTree):
+    node_class = LatchedNode
+
+    @staticmethod
+    def _lock(node):
+        node.latch.acquire()
+        node.version += 1
+
+    @staticmethod
+    def _unlock(node):
+        node.version += 1
+        node.latch.release()
+
+    # latches node only if it still has the version seen by an optimistic read
+    @staticmethod
+    def _lock_if_unchanged(node, version):
+        node.latch.acquire()
+        if node.version != version:
+            node.latch.release()
+            return False
+        node.version += 1
+        return True
+
+    # Optimistic descent to the leaf where key is (leftmost leaf for None).
+    # Returns (leaf, version); the version is even and was valid together
+    # with every node on the path.
+    def _optimistic_leaf(self, key):
+        while True:
+            try:
+                node = self.root
+                version = node.version
+                if version & 1 or self.root is not node:
+                    raise _Restart
+                while not node.leaf:
+                    i = 0 if key is None else bisect_right(node.keys, key)
+                    child = node.children[i]
+                    child_version = child.version
+                    if node.version != version or child_version & 1:
+                        raise _Restart
+                    node, version = child, child_version
+                return node, version
+            except (_Restart, IndexError):
+                # a writer is changing the path: let it run and try again
+                time.sleep(0)
+
+    def search(self, key):
+        while True:
+            leaf, version = self._optimistic_leaf(key)
+            try:
+                keys = leaf.keys
+                i = bisect_left(keys, key)
+                values = None
+                if i < len(keys) and keys[i] == key:
+                    values = list(self._values_of(leaf.values[i]))
+            except IndexError:
+                continue
+            if leaf.version == version:
+                return values
+
+    def search_many(self, keys):
+        return [self.search(key) for key in _as_list(keys)]
+
+    def _range_forward(self, lo, hi, lo_inclusive, hi_inclusive):
+        # (start, start_inclusive) is where to resume after the last yielded key
+        start, start_inclusive = lo, lo_inclusive
+        leaf, version = self._optimistic_leaf(start)
+        while leaf is not None:
+            keys = leaf.keys[:]
+            values = leaf.values[:]
+            next_leaf = leaf.next
+            next_version = next_leaf.version if next_leaf is not None else 0
+            if leaf.version != version or len(keys) != len(values) or next_version & 1:
+                leaf, version = self._optimistic_leaf(start)
+                continue
+
+            i = 0
+            if start is not None:
+                i = bisect_left(keys, start) if start_inclusive else bisect_right(keys, start)
+            for i in range(i, len(keys)):
+                k = keys[i]
+                if hi is not None and (k > hi or (k == hi and not hi_inclusive)):
+                    return
+                yield k, list(self._values_of(values[i]))
+                start, start_inclusive = k, False
+            leaf, version = next_leaf, next_version
+
+    # there are no back links to follow optimistically: read forward and reverse
+    def _range_reversed(self, lo, hi, lo_inclusive, hi_inclusive):
+        return reversed(list(self._range_forward(lo, hi, lo_inclusive, hi_inclusive)))
+
+    def count_range(self, lo=None, hi=None, inclusive=True):
+        return sum(1 for _ in self.range(lo, hi, inclusive))
+
+    # inserts into a latched leaf; True if the leaf is now over-full
+    def _insert_in_leaf(self, leaf, key, value):
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            self._add_value(leaf, i, value)
+        else:
+            leaf.keys.insert(i, key)
+            leaf.values.insert(i, self._new_value(value))
+        return len(leaf.keys) > leaf.order
+
+    def insert(self, key, value: any):
+        while True:
+            leaf, version = self._optimistic_leaf(key)
+            if len(leaf.keys) >= leaf.order:
+                break
+            if not self._lock_if_unchanged(leaf, version):
+                continue
+            self._insert_in_leaf(leaf, key, value)
+            self._unlock(leaf)
+            return
+        self._insert_crabbing(key, value)
+
+    def _insert_crabbing(self, key, value):
+        while True:
+            node = self.root
+            self._lock(node)
+            if self.root is node:
+                break
+            self._unlock(node)
+
+        held = [node]
+        parent_stack = []
+        while not node.leaf:
+            i = bisect_right(node.keys, key)
+            child = node.children[i]
+            self._lock(child)
+            if len(child.keys) < child.order:
+                # child can't split: nothing above it will change
+                for n in held:
+                    self._unlock(n)
+                held.clear()
+                parent_stack.clear()
+            else:
+                parent_stack.append((node, i))
+            held.append(child)
+            node = child
+
+        try:
+            if self._insert_in_leaf(node, key, value):
+                self._split_leaf(node, parent_stack)
+        finally:
+            for n in held:
+                self._unlock(n)
+
+    def insert_many(self, pairs):
+        for key, value in _as_list(pairs):
+            self.insert(key, value)
+
+    def remove(self, key):
+        while True:
+            leaf, version = self._optimistic_leaf(key)
+            if not self._lock_if_unchanged(leaf, version):
+                continue
+            try:
+                i = bisect_left(leaf.keys, key)
+                if i == len(leaf.keys) or leaf.keys[i] != key:
+                    return False
+                leaf.keys.pop(i)
+                leaf.values.pop(i)
+                return True
+            finally:
+                self._unlock(leaf)
+
+
+# Throughput with 1..N threads on a mixed workload (search-heavy by default).
+# On a free-threaded build (python3.13t) reads run in parallel.
+def main():
+    parser = argparse.ArgumentParser(description="Vazão da árvore B+ concorrente por número de threads")
+    parser.add_argument("-n", type=int, default=100_000, help="chaves carregadas")
+    parser.add_argument("--ops", type=int, default=200_000, help="operações por rodada (divididas entre as threads)")
+    parser.add_argument("--order", type=int, default=64)
+    parser.add_argument("--writes", type=float, default=0.05, help="fração de inserções")
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'ligado' if gil else 'desligado'}; n = {args.n}, {args.ops} operações, {args.writes:.0%} escritas")
+    print(f"{'threads':>7} {'ops/s':>12}")
+    for threads in map(int, args.threads.split(",")):
+        tree = ConcurrentBPlusTree.from_sorted(((k, k) for k in range(0, 2 * args.n, 2)), args.order, 0.7)
+        per_thread = args.ops // threads
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(per_thread):
+                key = rng.randrange(2 * args.n)
+                if rng.random() < args.writes:
+                    tree.insert(key, key)
+                else:
+                    tree.search(key)
+
+        workers = [threading.Thread(target=worker, args=(args.seed + t,)) for t in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        print(f"{threads:>7} {per_thread * threads / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
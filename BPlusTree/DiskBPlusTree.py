@@ -0,0 +1,447 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+import math
+import mmap
+import os
+import pickle
+import struct
+
+# Persistent B+ tree stored in a single file of fixed-size pages.
+#
+# Page 0 is the file header, every other page holds one node:
+#   header  : leaf flag (B), number of keys (H), next leaf page (q, -1 = none)
+#   keys    : n signed 64-bit integers
+#   internal: n + 1 child page ids (q)
+#   leaf    : length (I) + pickle of the list of value lists
+#
+# Pages are read through a memory-mapped view of the file and cached as Node
+# objects in an LRU buffer pool with a fixed number of frames. Modified nodes
+# are marked dirty and written back when evicted or on flush()/close().
+
+MAGIC = b"BPTD"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHIIqq")   # magic, version, page_size, order, root, page_count
+NODE_HEADER = struct.Struct("<BHq")       # leaf, n_keys, next
+VALUES_LEN = struct.Struct("<I")
+NO_PAGE = -1
+
+
+class Node:
+    __slots__ = ("page_id", "leaf", "keys", "values", "children", "next")
+
+    def __init__(self, page_id, leaf=True):
+        self.page_id = page_id
+        self.leaf = leaf
+        self.keys = []
+        self.values = []
+        self.children = []
+        self.next = NO_PAGE
+
+
+def encode_node(node):
+    n = len(node.keys)
+    parts = [NODE_HEADER.pack(node.leaf, n, node.next), struct.pack(f"<{n}q", *node.keys)]
+    if node.leaf:
+        blob = pickle.dumps(node.values, pickle.HIGHEST_PROTOCOL)
+        parts.append(VALUES_LEN.pack(len(blob)))
+        parts.append(blob)
+    else:
+        parts.append(struct.pack(f"<{n + 1}q", *node.children))
+    return b"".join(parts)
+
+
+def serialize_node(node, page_size):
+    data = encode_node(node)
+    if len(data) > page_size:
+        raise ValueError(f"nó {node.page_id} não cabe na página ({len(data)} > {page_size} bytes)")
+    return data
+
+
+def deserialize_node(page_id, data):
+    leaf, n, next_page = NODE_HEADER.unpack_from(data, 0)
+    offset = NODE_HEADER.size
+    node = Node(page_id, bool(leaf))
+    node.next = next_page
+    node.keys = list(struct.unpack_from(f"<{n}q", data, offset))
+    offset += 8 * n
+    if node.leaf:
+        (length,) = VALUES_LEN.unpack_from(data, offset)
+        offset += VALUES_LEN.size
+        node.values = pickle.loads(data[offset:offset + length])
+    else:
+        node.children = list(struct.unpack_from(f"<{n + 1}q", data, offset))
+    return node
+
+
+# File of fixed-size pages. Reads come from an mmap of the whole file; the
+# file grows in chunks (doubling) and is remapped when a new page is needed.
+class Pager:
+    def __init__(self, path, page_size):
+        self.page_size = page_size
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(page_size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    @property
+    def capacity(self):
+        return len(self.map) // self.page_size
+
+    def read(self, page_id):
+        offset = page_id * self.page_size
+        return self.map[offset:offset + self.page_size]
+
+    def write(self, page_id, data):
+        if page_id >= self.capacity:
+            self._grow(page_id + 1)
+        offset = page_id * self.page_size
+        self.map[offset:offset + len(data)] = data
+
+    def _grow(self, min_pages):
+        pages = max(min_pages, self.capacity * 2)
+        self.map.close()
+        self.file.truncate(pages * self.page_size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def sync(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+# LRU buffer pool of deserialized nodes. Pages touched by the running
+# operation are pinned and never evicted until release(); the pool may go
+# above its frame count temporarily if every frame is pinned.
+class BufferPool:
+    def __init__(self, pager, frames):
+        if frames < 1:
+            raise ValueError("frames deve ser >= 1")
+        self.pager = pager
+        self.frames = frames
+        self.cache = OrderedDict()
+        self.dirty = set()
+        self.pinned = set()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def get(self, page_id):
+        node = self.cache.get(page_id)
+        if node is not None:
+            self.cache.move_to_end(page_id)
+            self.hits += 1
+            self.pinned.add(page_id)
+        else:
+            self.misses += 1
+            node = deserialize_node(page_id, self.pager.read(page_id))
+            self.pinned.add(page_id)
+            self._admit(node)
+        return node
+
+    def add(self, node):
+        self.pinned.add(node.page_id)
+        self.dirty.add(node.page_id)
+        self._admit(node)
+
+    def mark_dirty(self, node):
+        self.dirty.add(node.page_id)
+
+    def _admit(self, node):
+        self.cache[node.page_id] = node
+        if len(self.cache) > self.frames:
+            self._evict()
+
+    def _evict(self):
+        skipped = 0
+        while len(self.cache) > self.frames and skipped < len(self.cache):
+            page_id, node = self.cache.popitem(last=False)
+            if page_id in self.pinned:
+                # in use by the current operation: back to the MRU end
+                self.cache[page_id] = node
+                skipped += 1
+                continue
+            if page_id in self.dirty:
+                self._write_back(node)
+
+    def _write_back(self, node):
+        self.pager.write(node.page_id, serialize_node(node, self.pager.page_size))
+        self.dirty.discard(node.page_id)
+        self.writes += 1
+
+    def release(self):
+        self.pinned.clear()
+        if len(self.cache) > self.frames:
+            self._evict()
+
+    def flush(self):
+        for page_id in sorted(self.dirty):
+            self._write_back(self.cache[page_id])
+        self.pager.sync()
+
+
+class DiskBPlusTree:
+    def __init__(self, path, order=None, page_size=4096, frames=256):
+        self.pager = Pager(path, page_size)
+        header = self.pager.read(0)
+        if header[:4] == MAGIC:
+            magic, version, file_page_size, order, root, page_count = FILE_HEADER.unpack_from(header, 0)
+            if version != VERSION:
+                raise ValueError(f"versão de arquivo não suportada: {version}")
+            if file_page_size != page_size:
+                self.pager.close()
+                self.pager = Pager(path, file_page_size)
+            self.order = order
+            self.root_id = root
+            self.page_count = page_count
+        else:
+            if order is None:
+                # as many separators as fit in an internal page
+                order = (page_size - NODE_HEADER.size - 8) // 16
+            self.order = order
+            self.root_id = 1
+            self.page_count = 2
+        if self.order < 3 or NODE_HEADER.size + 16 * self.order + 8 > self.pager.page_size:
+            raise ValueError(f"ordem {self.order} inválida para páginas de {self.pager.page_size} bytes")
+
+        self.page_size = self.pager.page_size
+        # a single value list may use at most a quarter of a page, so a leaf
+        # split by bytes always produces two halves that fit
+        self.max_value_bytes = self.page_size // 4
+        self.pool = BufferPool(self.pager, frames)
+        if header[:4] != MAGIC:
+            self.pool.add(Node(self.root_id))
+            self.flush()
+
+    def _new_node(self, leaf):
+        node = Node(self.page_count, leaf)
+        self.page_count += 1
+        self.pool.add(node)
+        return node
+
+    def _descend(self, key, parent_stack=None):
+        current = self.pool.get(self.root_id)
+        while not current.leaf:
+            i = bisect_right(current.keys, key)
+            if parent_stack is not None:
+                parent_stack.append((current, i))
+            current = self.pool.get(current.children[i])
+        return current
+
+    def search(self, key: int):
+        try:
+            leaf = self._descend(key)
+            i = bisect_left(leaf.keys, key)
+            if i < len(leaf.keys) and leaf.keys[i] == key:
+                return leaf.values[i]
+            return None
+        finally:
+            self.pool.release()
+
+    def range(self, lo=None, hi=None):
+        # lo <= key <= hi; pages are pinned only while the current leaf is read
+        if lo is None:
+            current = self.pool.get(self.root_id)
+            while not current.leaf:
+                current = self.pool.get(current.children[0])
+            leaf, i = current, 0
+        else:
+            leaf = self._descend(lo)
+            i = bisect_left(leaf.keys, lo)
+        while True:
+            batch = []
+            for k, v in zip(leaf.keys[i:], leaf.values[i:]):
+                if hi is not None and k > hi:
+                    break
+                batch.append((k, v))
+            else:
+                next_page = leaf.next
+                self.pool.release()
+                yield from batch
+                if next_page == NO_PAGE:
+                    return
+                leaf, i = self.pool.get(next_page), 0
+                continue
+            self.pool.release()
+            yield from batch
+            return
+
+    def items(self):
+        return self.range()
+
+    def insert(self, key: int, value: any):
+        try:
+            parent_stack = []
+            leaf = self._descend(key, parent_stack)
+            i = bisect_left(leaf.keys, key)
+            if i < len(leaf.keys) and leaf.keys[i] == key:
+                values = leaf.values[i] + [value]
+                self._check_value_size(values)
+                leaf.values[i] = values
+            else:
+                self._check_value_size([value])
+                leaf.keys.insert(i, key)
+                leaf.values.insert(i, [value])
+            self.pool.mark_dirty(leaf)
+
+            if len(leaf.keys) > self.order or self._leaf_bytes(leaf) > self.page_size:
+                self._split_leaf(leaf, parent_stack)
+        finally:
+            self.pool.release()
+
+    def _check_value_size(self, values):
+        if len(pickle.dumps(values, pickle.HIGHEST_PROTOCOL)) > self.max_value_bytes:
+            raise ValueError(f"valores de uma chave excedem {self.max_value_bytes} bytes")
+
+    def _leaf_bytes(self, leaf):
+        return len(encode_node(leaf))
+
+    # The split point is always chosen by bytes, also when the leaf splits for
+    # having more than order keys: splitting by count can leave a few large
+    # values together in a half that doesn't fit in a page. Any point in
+    # [1, n - 1] keeps both halves within order keys. With every value list
+    # capped at max_value_bytes, both halves of a byte split fit in a page;
+    # this is checked here, not later when the page is written back.
+    def _split_leaf(self, leaf, parent_stack):
+        # first key where the left half reaches half the bytes
+        sizes = [len(pickle.dumps(v, pickle.HIGHEST_PROTOCOL)) + 8 for v in leaf.values]
+        half = sum(sizes) / 2
+        acc = 0
+        for mid, size in enumerate(sizes):
+            acc += size
+            if acc >= half:
+                break
+        mid = max(1, min(mid, len(leaf.keys) - 1))
+
+        new_leaf = self._new_node(leaf=True)
+        new_leaf.keys = leaf.keys[mid:]
+        new_leaf.values = leaf.values[mid:]
+        leaf.keys = leaf.keys[:mid]
+        leaf.values = leaf.values[:mid]
+        new_leaf.next = leaf.next
+        leaf.next = new_leaf.page_id
+        for half_leaf in (leaf, new_leaf):
+            assert self._leaf_bytes(half_leaf) <= self.page_size, \
+                f"metade da divisão não cabe na página ({self._leaf_bytes(half_leaf)} > {self.page_size} bytes)"
+        self.pool.mark_dirty(leaf)
+        self._insert_in_parent(leaf, new_leaf, new_leaf.keys[0], parent_stack)
+
+    def _insert_in_parent(self, node, new_node, key, parent_stack):
+        if not parent_stack:
+            new_root = self._new_node(leaf=False)
+            new_root.keys = [key]
+            new_root.children = [node.page_id, new_node.page_id]
+            self.root_id = new_root.page_id
+            return
+
+        parent, index = parent_stack.pop()
+        parent.keys.insert(index, key)
+        parent.children.insert(index + 1, new_node.page_id)
+        self.pool.mark_dirty(parent)
+        if len(parent.keys) > self.order:
+            self._split_internal(parent, parent_stack)
+
+    def _split_internal(self, node, parent_stack):
+        mid = math.ceil(self.order / 2)
+        new_node = self._new_node(leaf=False)
+        promoted_key = node.keys[mid]
+        new_node.keys = node.keys[mid + 1:]
+        new_node.children = node.children[mid + 1:]
+        node.keys = node.keys[:mid]
+        node.children = node.children[:mid + 1]
+        self.pool.mark_dirty(node)
+        self._insert_in_parent(node, new_node, promoted_key, parent_stack)
+
+    # Removes the key from its leaf. Nodes are not merged: an under-full leaf
+    # stays in place, which keeps removes to a single page write.
+    def remove(self, key: int):
+        try:
+            leaf = self._descend(key)
+            i = bisect_left(leaf.keys, key)
+            if i == len(leaf.keys) or leaf.keys[i] != key:
+                return False
+            leaf.keys.pop(i)
+            leaf.values.pop(i)
+            self.pool.mark_dirty(leaf)
+            return True
+        finally:
+            self.pool.release()
+
+    def flush(self):
+        self.pool.flush()
+        header = FILE_HEADER.pack(MAGIC, VERSION, self.page_size, self.order, self.root_id, self.page_count)
+        self.pager.write(0, header)
+        self.pager.sync()
+
+    def close(self):
+        self.flush()
+        self.pager.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def display(self):
+        nodes = [self.root_id]
+        level = 0
+        while nodes:
+            print(f"Level {level}: ", end="")
+            next_nodes = []
+            for page_id in nodes:
+                n = self.pool.get(page_id)
+                print(n.keys, end=" | ")
+                if not n.leaf:
+                    next_nodes.extend(n.children)
+            print()
+            self.pool.release()
+            nodes = next_nodes
+            level += 1
+
+
+def main():
+    path = input("Arquivo do índice: ") or "bplustree.db"
+    with DiskBPlusTree(path) as tree:
+        while True:
+            print("\n===== B+ TREE EM DISCO =====")
+            print("1 - Inserir")
+            print("2 - Buscar")
+            print("3 - Remover")
+            print("4 - Mostrar árvore")
+            print("5 - Sair")
+
+            op = input("Escolha: ")
+
+            if op == "1":
+                key = int(input("Chave: "))
+                value = input("Valor: ")
+                tree.insert(key, value)
+                print("Inserido.\n")
+
+            elif op == "2":
+                key = int(input("Chave: "))
+                print("Resultado:", tree.search(key))
+
+            elif op == "3":
+                key = int(input("Chave: "))
+                ok = tree.remove(key)
+                print("Removido." if ok else "Chave não encontrada.")
+
+            elif op == "4":
+                print("\nÁrvore:")
+                tree.display()
+
+            elif op == "5":
+                print("Encerrando...")
+                break
+
+            else:
+                print("Opção inválida!")
+
+
+if __name__ == "__main__":
+    main()
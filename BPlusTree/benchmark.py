@@ -0,0 +1,94 @@
+import argparse
+import random
+import time
+
+from BPlusTree import BPlusTree
+
+# Benchmark of how each operation scales with the order of the tree.
+# For every order, inserts n random keys, searches all of them and removes
+# half of them, reporting the average time per operation in microseconds,
+# the p99 latency of the removes and the memory left in the structure
+# (BPlusTree.memory_usage). With --lazy-delete the removes only leave
+# tombstones and the "compact" column is the cost (per removed key) of the
+# compact_step() slices run afterwards to reclaim them.
+# --keys bytes/tuple uses composite tenant + timestamp keys instead of ints
+# (compare the memory with and without --prefix-compression).
+ORDERS = [4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+def make_key(kind, k):
+    # 100 tenants, timestamps spread over the key space
+    if kind == "bytes":
+        return b"tenant-%04d/%016d" % (k % 100, k // 100)
+    if kind == "tuple":
+        return ("tenant-%04d" % (k % 100), k // 100)
+    return k
+
+
+def run(order, keys, compact=False, lazy_delete=False, prefix_compression=False):
+    tree = BPlusTree(order, compact, lazy_delete, prefix_compression)
+
+    start = time.perf_counter()
+    for k in keys:
+        tree.insert(k, k)
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in keys:
+        tree.search(k)
+    search_time = time.perf_counter() - start
+
+    to_remove = keys[: len(keys) // 2]
+    latencies = []
+    clock = time.perf_counter
+    for k in to_remove:
+        t0 = clock()
+        tree.remove(k)
+        latencies.append(clock() - t0)
+    remove_time = sum(latencies)
+    latencies.sort()
+    remove_p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+
+    start = time.perf_counter()
+    if lazy_delete:
+        while not tree.compact_step():
+            pass
+    compact_time = time.perf_counter() - start
+    memory = tree.memory_usage()["total_bytes"]
+
+    n = len(keys)
+    removed = max(1, len(to_remove))
+    return (
+        insert_time / n * 1e6,
+        search_time / n * 1e6,
+        remove_time / removed * 1e6,
+        remove_p99 * 1e6,
+        compact_time / removed * 1e6,
+        memory / 1024,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da árvore B+ por ordem")
+    parser.add_argument("-n", type=int, default=100_000, help="quantidade de chaves")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compact", action="store_true", help="usa o modo compacto dos nós")
+    parser.add_argument("--lazy-delete", action="store_true", help="remoções com tombstones + compact_step()")
+    parser.add_argument("--keys", choices=("int", "bytes", "tuple"), default="int",
+                        help="tipo das chaves (bytes/tuple: inquilino + timestamp)")
+    parser.add_argument("--prefix-compression", action="store_true",
+                        help="guarda o prefixo comum das chaves de cada folha uma vez só")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = [make_key(args.keys, k) for k in rng.sample(range(args.n * 10), args.n)]
+
+    print(f"n = {args.n} chaves {args.keys} (tempo médio por operação, µs)")
+    print(f"{'ordem':>6} {'insert':>10} {'search':>10} {'remove':>10} {'rm p99':>10} {'compact':>10} {'memória KiB':>12}")
+    for order in ORDERS:
+        ins, sea, rem, p99, comp, mem = run(order, keys, args.compact, args.lazy_delete, args.prefix_compression)
+        print(f"{order:>6} {ins:>10.2f} {sea:>10.2f} {rem:>10.2f} {p99:>10.2f} {comp:>10.2f} {mem:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import argparse
+import random
+import sys
+import threading
+import time
+
+from ExtensibleHash import Bucket, ExtensibleHash, _as_list, default_hash
+
+# O diretório é dividido em pedaços de 2^DIR_CHUNK_BITS entradas: uma
+# alteração copia só os pedaços que muda (e a lista de pedaços).
+DIR_CHUNK_BITS = 10
+_CHUNK_MASK = (1 << DIR_CHUNK_BITS) - 1
+
+
+class LockedBucket(Bucket):
+    """Bucket com lock próprio e contador de versão.
+
+    O escritor segura o lock e incrementa a versão antes e depois de mudar
+    o bucket (ou a cadeia de overflow dele), então a versão fica ímpar
+    durante a alteração. Um bucket que sai do diretório (dividido ou
+    esvaziado num merge) é marcado obsolete e não muda mais.
+    """
+    __slots__ = ("lock", "version", "obsolete")
+
+    def __init__(self, local_depth: int):
+        super().__init__(local_depth)
+        self.lock = threading.Lock()
+        self.version = 0
+        self.obsolete = False
+
+
+class ConcurrentExtensibleHash:
+    def __init__(self, bucket_size: int, hash_func=None, max_depth: int = 24):
+        """Hash extensível seguro para várias threads.
+
+        O diretório aponta direto para os buckets e nunca é alterado no
+        lugar: cada divisão ou merge monta uma cópia (só dos pedaços
+        afetados) e a publica com uma única atribuição de self._view. As
+        buscas não usam lock: leem a versão do bucket, procuram a chave e
+        conferem se a versão não mudou (senão repetem).
+
+        As escritas travam só o bucket da chave. Uma divisão cria dois
+        buckets novos a partir do cheio, que continua intacto (e válido
+        para quem ainda o lê) até o diretório novo ser publicado; só a
+        publicação passa pelo lock do diretório.
+        """
+        self._hash = hash_func if hash_func is not None else default_hash
+        self.bucket_size = bucket_size
+        self.max_depth = max_depth
+        self.depth_counts = [0, 2]
+        self._dir_lock = threading.Lock()
+        # (profundidade global, pedaços do diretório)
+        self._view = (1, [[LockedBucket(1), LockedBucket(1)]])
+
+    @property
+    def global_depth(self) -> int:
+        return self._view[0]
+
+    @property
+    def directory(self) -> list:
+        """Cópia do diretório publicado (lista de buckets)."""
+        return [bucket for chunk in self._view[1] for bucket in chunk]
+
+    @staticmethod
+    def _entry(view, h):
+        depth, chunks = view
+        i = h & ((1 << depth) - 1)
+        return chunks[i >> DIR_CHUNK_BITS][i & _CHUNK_MASK]
+
+    @staticmethod
+    def _repoint(depth, chunks, pattern, stride, targets):
+        """Cópia de chunks com as entradas padrao + k*stride apontando para targets[k % len(targets)]."""
+        chunks = list(chunks)
+        copied = set()
+        for k, i in enumerate(range(pattern, 1 << depth, stride)):
+            c = i >> DIR_CHUNK_BITS
+            if c not in copied:
+                chunks[c] = list(chunks[c])
+                copied.add(c)
+            chunks[c][i & _CHUNK_MASK] = targets[k % len(targets)]
+        return chunks
+
+    @staticmethod
+    def _grow(depth, chunks):
+        # as duas metades do diretório novo compartilham os pedaços antigos
+        if depth < DIR_CHUNK_BITS:
+            return depth + 1, [chunks[0] * 2]
+        return depth + 1, chunks + chunks
+
+    @staticmethod
+    def _shrink(depth, chunks):
+        if depth <= DIR_CHUNK_BITS:
+            return depth - 1, [chunks[0][:1 << (depth - 1)]]
+        return depth - 1, chunks[:len(chunks) // 2]
+
+    def _count_depth(self, local_depth: int, delta: int):
+        while len(self.depth_counts) <= local_depth:
+            self.depth_counts.append(0)
+        self.depth_counts[local_depth] += delta
+
+    def _append(self, bucket, key, value):
+        while len(bucket.keys) >= self.bucket_size:
+            if bucket.overflow is None:
+                bucket.overflow = Bucket(bucket.local_depth)
+            bucket = bucket.overflow
+        bucket.append(key, value)
+
+    def _lock_bucket(self, h):
+        """Trava o bucket do hash h no diretório atual."""
+        while True:
+            bucket = self._entry(self._view, h)
+            bucket.lock.acquire()
+            if not bucket.obsolete:
+                return bucket
+            bucket.lock.release()
+
+    def search(self, key) -> any:
+        """Retorna o valor associado à chave, se existir (sem lock)."""
+        h = self._hash(key)
+        while True:
+            bucket = self._entry(self._view, h)
+            version = bucket.version
+            if version & 1:
+                time.sleep(0)
+                continue
+            value = None
+            try:
+                node = bucket
+                while node is not None:
+                    i = node.slots.get(key)
+                    if i is not None:
+                        value = node.values[i]
+                        break
+                    node = node.overflow
+            except IndexError:
+                continue
+            if bucket.version == version and not bucket.obsolete:
+                return value
+
+    def search_many(self, keys) -> list:
+        return [self.search(key) for key in _as_list(keys)]
+
+    def insert(self, key, value):
+        """Insere ou atualiza um par (chave, valor)."""
+        h = self._hash(key)
+        while True:
+            bucket = self._lock_bucket(h)
+            try:
+                node = bucket
+                while node is not None:
+                    i = node.slots.get(key)
+                    if i is not None:
+                        bucket.version += 1
+                        node.values[i] = value
+                        bucket.version += 1
+                        return
+                    node = node.overflow
+
+                if len(bucket.keys) < self.bucket_size or not self._can_split(bucket, h):
+                    bucket.version += 1
+                    self._append(bucket, key, value)
+                    bucket.version += 1
+                    return
+
+                self._split(bucket, h)
+            finally:
+                bucket.lock.release()
+
+    def insert_many(self, pairs):
+        for key, value in _as_list(pairs):
+            self.insert(key, value)
+
+    def _can_split(self, bucket, h) -> bool:
+        if bucket.local_depth >= self.max_depth:
+            return False
+        hash_func = self._hash
+        return any(hash_func(k) != h for k, _ in ExtensibleHash._chain_items(bucket))
+
+    def _split(self, bucket, h):
+        """Troca o bucket travado por dois buckets novos e publica o diretório."""
+        ld = bucket.local_depth
+        diff_bit = 1 << ld
+        low, high = LockedBucket(ld + 1), LockedBucket(ld + 1)
+        hash_func = self._hash
+        for k, v in ExtensibleHash._chain_items(bucket):
+            self._append(high if hash_func(k) & diff_bit else low, k, v)
+
+        with self._dir_lock:
+            depth, chunks = self._view
+            if ld + 1 > depth:
+                depth, chunks = self._grow(depth, chunks)
+            # padrao + k * 2^ld alterna entre low (k par) e high (k ímpar)
+            chunks = self._repoint(depth, chunks, h & (diff_bit - 1), diff_bit, (low, high))
+            self._count_depth(ld, -1)
+            self._count_depth(ld + 1, 2)
+            self._view = (depth, chunks)
+
+        bucket.version += 1
+        bucket.obsolete = True
+        bucket.version += 1
+
+    def remove(self, key) -> bool:
+        """Remove a chave; um bucket que fica vazio tenta se juntar ao irmão."""
+        h = self._hash(key)
+        bucket = self._lock_bucket(h)
+        try:
+            node, prev = bucket, None
+            while node is not None:
+                i = node.slots.get(key)
+                if i is not None:
+                    bucket.version += 1
+                    node.remove_at(i)
+                    ExtensibleHash._compact_chain(node, prev)
+                    bucket.version += 1
+                    if len(bucket.keys) == 0:
+                        self._try_merge(bucket, h)
+                    return True
+                prev, node = node, node.overflow
+            return False
+        finally:
+            bucket.lock.release()
+
+    def _try_merge(self, bucket, h):
+        """Junta o bucket vazio (travado) ao irmão, se o lock do irmão estiver livre.
+
+        O irmão é travado sem esperar: quem espera por um bucket nunca
+        segura o lock do diretório, então não há deadlock; se o irmão
+        estiver ocupado o merge fica para uma próxima remoção.
+        """
+        ld = bucket.local_depth
+        if ld == 0:
+            return
+        stride = 1 << ld
+        pattern = h & (stride - 1)
+        with self._dir_lock:
+            depth, chunks = self._view
+            buddy = self._entry((depth, chunks), pattern ^ (stride >> 1))
+            if buddy is bucket or buddy.local_depth != ld or not buddy.lock.acquire(blocking=False):
+                return
+            try:
+                buddy.version += 1
+                buddy.local_depth -= 1
+                buddy.version += 1
+                chunks = self._repoint(depth, chunks, pattern, stride, (buddy,))
+                self._count_depth(ld, -2)
+                self._count_depth(ld - 1, 1)
+                while depth > 1 and self.depth_counts[depth] == 0:
+                    depth, chunks = self._shrink(depth, chunks)
+                self._view = (depth, chunks)
+            finally:
+                buddy.lock.release()
+
+        bucket.version += 1
+        bucket.obsolete = True
+        bucket.version += 1
+
+    def _buckets(self, view):
+        seen = set()
+        for chunk in view[1]:
+            for bucket in chunk:
+                if id(bucket) not in seen:
+                    seen.add(id(bucket))
+                    yield bucket
+
+    def items(self) -> list:
+        """Lista de todos os pares (chave, valor), lida bucket a bucket sem lock.
+
+        Cada bucket é lido de forma consistente; se algum deixar o
+        diretório durante a leitura (divisão ou merge), a leitura recomeça.
+        """
+        while True:
+            result = []
+            for bucket in self._buckets(self._view):
+                while True:
+                    version = bucket.version
+                    if version & 1:
+                        time.sleep(0)
+                        continue
+                    pairs = list(ExtensibleHash._chain_items(bucket))
+                    if bucket.version == version:
+                        break
+                if bucket.obsolete:
+                    break
+                result.extend(pairs)
+            else:
+                return result
+            time.sleep(0)
+
+    def directory_stats(self) -> dict:
+        """Estatísticas da versão publicada do diretório."""
+        view = self._view
+        buckets = list(self._buckets(view))
+        items = sum(len(node) for bucket in buckets for node in self._chain(bucket))
+        overflow_nodes = sum(1 for bucket in buckets for _ in self._chain(bucket.overflow))
+        directory_size = 1 << view[0]
+        return {
+            "global_depth": view[0],
+            "directory_size": directory_size,
+            "buckets": len(buckets),
+            "directory_to_bucket_ratio": directory_size / len(buckets),
+            "items": items,
+            "load_factor": items / (len(buckets) * self.bucket_size),
+            "overflow_buckets": overflow_nodes,
+            "local_depths": {d: n for d, n in enumerate(self.depth_counts) if n},
+        }
+
+    def stats(self) -> dict:
+        stats = self.directory_stats()
+        stats["bucket_size"] = self.bucket_size
+        return stats
+
+    @staticmethod
+    def _chain(node):
+        while node is not None:
+            yield node
+            node = node.overflow
+
+
+def main():
+    """Vazão com 1..N threads numa carga majoritariamente de leitura."""
+    parser = argparse.ArgumentParser(description="Vazão do hash extensível concorrente por número de threads")
+    parser.add_argument("-n", type=int, default=100_000, help="chaves carregadas")
+    parser.add_argument("--ops", type=int, default=200_000, help="operações por rodada (divididas entre as threads)")
+    parser.add_argument("--bucket-size", type=int, default=64)
+    parser.add_argument("--writes", type=float, default=0.05, help="fração de inserções")
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'ligado' if gil else 'desligado'}; n = {args.n}, {args.ops} operações, {args.writes:.0%} escritas")
+    print(f"{'threads':>7} {'ops/s':>12}")
+    for threads in map(int, args.threads.split(",")):
+        table = ConcurrentExtensibleHash(args.bucket_size)
+        for k in range(0, 2 * args.n, 2):
+            table.insert(k, k)
+        per_thread = args.ops // threads
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(per_thread):
+                key = rng.randrange(2 * args.n)
+                if rng.random() < args.writes:
+                    table.insert(key, key)
+                else:
+                    table.search(key)
+
+        workers = [threading.Thread(target=worker, args=(args.seed + t,)) for t in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        print(f"{threads:>7} {per_thread * threads / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
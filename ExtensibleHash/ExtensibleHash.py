@@ -1,6 +1,274 @@
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+from array import array
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+_MASK64 = (1 << 64) - 1
+_FIBONACCI = 0x9E3779B97F4A7C15  # 2^64 / razão áurea
+
+
+def identity_hash(key: int) -> int:
+    """Hash simples (retornando a própria chave); usado pelo menu didático."""
+    return key
+
+
+def fibonacci_hash(key: int) -> int:
+    """Hash multiplicativo (Fibonacci) de inteiros.
+
+    Devolve os 32 bits altos do produto de 64 bits: cada bit do resultado
+    depende de todos os bits baixos da chave, então IDs sequenciais e
+    timestamps se espalham pelo diretório.
+    """
+    return ((key * _FIBONACCI) & _MASK64) >> 32
+
+
+def make_seeded_hash(seed: bytes = b"csgbd"):
+    """Cria um hash de str/bytes com semente (BLAKE2b de 8 bytes).
+
+    Ao contrário de hash(), o resultado é o mesmo entre execuções.
+    """
+    def seeded_hash(key) -> int:
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8, key=seed).digest(), "little")
+    return seeded_hash
+
+
+_seeded_hash = make_seeded_hash()
+
+
+def default_hash(key) -> int:
+    """Fibonacci para inteiros, BLAKE2b com semente para str/bytes.
+
+    Tuplas combinam o hash de cada elemento; floats usam o hash numérico
+    (um float inteiro cai onde cai o int igual a ele) e None um valor fixo.
+    O resultado é o mesmo entre execuções; outros tipos levantam
+    TypeError, porque hash() deles muda a cada processo.
+    """
+    if isinstance(key, int):
+        return fibonacci_hash(key)
+    if isinstance(key, (str, bytes)):
+        return _seeded_hash(key)
+    if isinstance(key, tuple):
+        h = len(key)
+        for item in key:
+            h = (h * _FIBONACCI + default_hash(item)) & _MASK64
+        return fibonacci_hash(h)
+    if isinstance(key, float):
+        return fibonacci_hash(int(key) if key.is_integer() else hash(key))
+    if key is None:
+        return 0
+    raise TypeError(f"default_hash não tem hash estável para {type(key).__name__}; passe hash_func")
+
+
+def _as_list(seq):
+    """Lote como lista; tolist() converte arrays NumPy (e seus escalares) para int."""
+    return seq.tolist() if hasattr(seq, "tolist") else list(seq)
+
+# mensagens de rastreamento por evento (formatadas só com rastreamento ligado)
+_MESSAGES = {
+    "split": "\n dividindo bucket {bucket_id} profundidade local {local_depth}",
+    "grow": "aumentando profundidade global\nnova profundidade global: {global_depth}",
+    "insert": "Inserindo chave {key} no bucket {bucket_id} (dir index: {dir_index}, bits: {bits})",
+    "found": "Chave {key} encontrada no bucket {bucket_id} (dir index: {dir_index}, bits: {bits})",
+    "not_found": "Chave {key} não encontrada no bucket",
+    "removed": "Chave {key} removida do bucket {bucket_id} (dir index: {dir_index}, bits: {bits})",
+    "remove_missing": "Chave {key} não encontrada para remoção",
+    "overflow": "bucket {bucket_id} cheio e sem como dividir: chave {key} vai para o overflow",
+}
+
+
+class Bucket:
+    """Bucket com chaves e valores em listas paralelas.
+
+    slots mapeia chave -> posição nas listas, então buscar não depende do
+    tamanho do bucket; remover troca o item com o último (swap-remove) em
+    vez de deslocar a lista. overflow aponta para o próximo nó da cadeia.
+    """
+    __slots__ = ("local_depth", "keys", "values", "slots", "overflow")
+
+    def __init__(self, local_depth: int):
+        self.local_depth = local_depth
+        self.keys = []
+        self.values = []
+        self.slots = {}
+        self.overflow = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def append(self, key, value):
+        self.slots[key] = len(self.keys)
+        self.keys.append(key)
+        self.values.append(value)
+
+    def remove_at(self, i: int):
+        last = len(self.keys) - 1
+        del self.slots[self.keys[i]]
+        if i != last:
+            moved = self.keys[last]
+            self.keys[i] = moved
+            self.values[i] = self.values[last]
+            self.slots[moved] = i
+        self.keys.pop()
+        self.values.pop()
+
+    def pop(self):
+        key = self.keys.pop()
+        del self.slots[key]
+        return key, self.values.pop()
+
+    def items(self):
+        return list(zip(self.keys, self.values))
+
+
+# Snapshot (save/load): arrays planos, uma página por bucket (a cadeia de
+# overflow inteira vai na página do bucket).
+#   cabeçalho     : SNAPSHOT_HEADER, seguido de (offset, tamanho) das seções
+#   directory     : u32 por entrada do diretório (id do bucket)
+#   depths        : u8 por bucket, profundidade local (255 = slot livre)
+#   key_offsets   : buckets + 1 u64, início das chaves de cada bucket em keys
+#   keys          : chaves int64 (flag _SNAP_INT_KEYS) ou um pickle por bucket
+#   value_offsets : buckets + 1 u64, início dos valores de cada bucket em values
+#   values        : um pickle por bucket com a lista dos valores
+#   hash_sample   : pickle de até _HASH_SAMPLE pares (chave, hash) de buckets
+#                   espalhados, para load() conferir que o hash é o mesmo
+# load() mapeia o arquivo e cria só o diretório e um bucket "vazio" por
+# slot; as chaves e valores de um bucket são lidos do mapa no primeiro
+# acesso a ele.
+SNAPSHOT_MAGIC = b"EXHS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SECTIONS = ("directory", "depths", "key_offsets", "keys", "value_offsets", "values", "hash_sample")
+# magic, versão, flags, bucket_size, max_depth, global_depth, buckets, nome do hash, seções
+SNAPSHOT_HEADER = struct.Struct("<4sHHIIIq32s" + "qq" * len(SNAPSHOT_SECTIONS))
+_SNAP_INT_KEYS = 1
+_FREE_SLOT = 255
+_HASH_SAMPLE = 32
+
+
+def _blob_offsets(blobs):
+    offsets = array("Q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return offsets
+
+
+def _write_sections(path, header, fields, sections):
+    """Grava cabeçalho e seções (alinhadas em 8 bytes) num temporário e renomeia."""
+    layout = []
+    offset = header.size
+    for data in sections:
+        offset += -offset % 8
+        size = memoryview(data).nbytes
+        layout += [offset, size]
+        offset += size
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.pack(*fields, *layout))
+        for data, start in zip(sections, layout[::2]):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _LazyBucket(Bucket):
+    """Bucket de um snapshot ainda não lido: o primeiro acesso a um campo carrega a página."""
+    __slots__ = ("_pages", "_page")
+
+    def __getattr__(self, name):
+        pages = self._pages
+        if pages is None:
+            raise AttributeError(name)
+        pages.materialize(self)
+        return getattr(self, name)
+
+
+class _Snapshot:
+    """Snapshot aberto: o mapa do arquivo e as seções como memoryviews."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < SNAPSHOT_HEADER.size:
+            raise ValueError(f"{path}: arquivo curto demais para um snapshot")
+        (magic, version, flags, self.bucket_size, self.max_depth, self.global_depth,
+         self.bucket_count, hash_name, *layout) = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path}: não é um snapshot de ExtensibleHash")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path}: versão de snapshot {version} não suportada")
+        self.hash_name = hash_name.rstrip(b"\0").decode()
+        self.int_keys = bool(flags & _SNAP_INT_KEYS)
+        view = memoryview(self.map)
+        sections = {name: view[start:start + size]
+                    for name, start, size in zip(SNAPSHOT_SECTIONS, layout[::2], layout[1::2])}
+        self.directory = sections["directory"].cast("I")
+        self.depths = sections["depths"]
+        self.key_offsets = sections["key_offsets"].cast("Q")
+        self.keys = sections["keys"].cast("q") if self.int_keys else sections["keys"]
+        self.value_offsets = sections["value_offsets"].cast("Q")
+        self.values = sections["values"]
+        self.hash_sample = pickle.loads(sections["hash_sample"])
+
+    def bucket(self, page):
+        stub = _LazyBucket.__new__(_LazyBucket)
+        stub._pages = self
+        stub._page = page
+        return stub
+
+    def materialize(self, stub):
+        """Lê a página do bucket: o nó principal e os nós de overflow (bucket_size itens cada)."""
+        page = stub._page
+        a, b = self.key_offsets[page], self.key_offsets[page + 1]
+        keys = self.keys[a:b].tolist() if self.int_keys else pickle.loads(self.keys[a:b])
+        values = pickle.loads(self.values[self.value_offsets[page]:self.value_offsets[page + 1]])
+        local_depth = self.depths[page]
+        size = self.bucket_size
+        overflow = None
+        for start in range((len(keys) - 1) // size * size, 0, -size):
+            node = Bucket(local_depth)
+            for key, value in zip(keys[start:start + size], values[start:start + size]):
+                node.append(key, value)
+            node.overflow = overflow
+            overflow = node
+        keys, values = keys[:size], values[:size]
+        stub.local_depth = local_depth
+        stub.keys = keys
+        stub.values = values
+        stub.slots = {key: i for i, key in enumerate(keys)}
+        stub.overflow = overflow
+        stub._pages = None
+
+
 class ExtensibleHash:
-    def __init__(self, bucket_size: int):
-        """Inicializa a tabela hash com o tamanho máximo de registros por bucket."""
+    def __init__(self, bucket_size: int, verbose: bool = False, on_event=None,
+                 hash_func=None, max_depth: int = 24):
+        """Inicializa a tabela hash com o tamanho máximo de registros por bucket.
+
+        Por padrão as operações são silenciosas. verbose=True imprime cada
+        passo (usado pelo menu), on_event(evento, dados) recebe os eventos e,
+        com o logger deste módulo em DEBUG na criação, eles vão para o logging.
+
+        hash_func(chave) -> int escolhe a função de hash (padrão: default_hash).
+        Um bucket cheio cujas chaves não podem ser separadas (mesmo hash, ou
+        profundidade local igual a max_depth) ganha uma cadeia de overflow
+        em vez de dividir para sempre; max_depth também limita o diretório
+        a 2^max_depth entradas.
+        """
+        self._hash = hash_func if hash_func is not None else default_hash
+        self.max_depth = max_depth
+        self.verbose = verbose
+        self.on_event = on_event
+        self._tracing = verbose or on_event is not None or logger.isEnabledFor(logging.DEBUG)
+
         # profundidade global
         self.bucket_size = bucket_size
         self.global_depth = 1
@@ -10,96 +278,170 @@ class ExtensibleHash:
 
         # iniciar 2 buckets
         for _ in range(2):
-            self.buckets.append({
-                "local_depth": 1,
-                "items": []
-            })
+            self.buckets.append(Bucket(1))
 
         # diretório inicial apontando para os dois buckets
         self.directory = [0, 1]
 
-    def _hash(self, key: int) -> int:
-        """hash simples (retornando a própria chave)"""
-        return key
+        # quantidade de buckets vivos por profundidade local e slots de
+        # self.buckets liberados por merges (reaproveitados nos splits)
+        self.depth_counts = [0, 2]
+        self._free_slots = []
+
+        # contadores de eventos (buscas, sondagens, divisões, merges...)
+        # enquanto ligados por enable_counters(); None = desligados
+        self.counters = None
+
+    def enable_counters(self):
+        """Liga os contadores (Counter) e os devolve; search_many/insert_many passam a ir chave a chave."""
+        self.counters = Counter()
+        return self.counters
+
+    def disable_counters(self):
+        self.counters = None
+
+    def _count_lookup(self, bucket):
+        """Conta uma busca: cada nó da cadeia que ela percorrer é uma sondagem."""
+        counters = self.counters
+        counters["lookups"] += 1
+        while bucket is not None:
+            counters["probes"] += 1
+            bucket = bucket.overflow
+
+    def _trace(self, event: str, **info):
+        if "dir_index" in info:
+            info["bits"] = format(info["dir_index"], f'0{self.global_depth}b')
+        if self.on_event is not None:
+            self.on_event(event, info)
+        if self.verbose:
+            print(_MESSAGES[event].format(**info))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(_MESSAGES[event].format(**info))
 
     def _get_directory_index(self, key: int) -> int:
         h = self._hash(key)
         mask = (1 << self.global_depth) - 1
         return h & mask
 
-    def _directory_indexes_for(self, bucket_id: int):
-        return [i for i, b in enumerate(self.directory) if b == bucket_id]
-
-    def _split_bucket(self, bucket_id: int):
-        """Divide o bucket quando ele estiver cheio e aumenta profundidade local"""
+    def _new_bucket(self, local_depth: int) -> int:
+        """Cria um bucket, reaproveitando um slot liberado por merge se houver."""
+        bucket = Bucket(local_depth)
+        if self._free_slots:
+            bucket_id = self._free_slots.pop()
+            self.buckets[bucket_id] = bucket
+        else:
+            bucket_id = len(self.buckets)
+            self.buckets.append(bucket)
+        self._count_depth(local_depth, 1)
+        return bucket_id
+
+    def _count_depth(self, local_depth: int, delta: int):
+        while len(self.depth_counts) <= local_depth:
+            self.depth_counts.append(0)
+        self.depth_counts[local_depth] += delta
+
+    def _split_bucket(self, bucket_id: int, dir_index: int):
+        """Divide o bucket quando ele estiver cheio e aumenta profundidade local.
+
+        As entradas do diretório que apontam para o bucket são as de índice
+        padrao + k * 2^local_depth, então só esse passo é percorrido.
+        """
         old_bucket = self.buckets[bucket_id]
-        old_local_depth = old_bucket["local_depth"]
+        old_local_depth = old_bucket.local_depth
 
-        print(f"\n dividindo bucket {bucket_id} profundidade local {old_local_depth}")
+        if self._tracing:
+            self._trace("split", bucket_id=bucket_id, local_depth=old_local_depth)
+        if self.counters is not None:
+            self.counters["splits"] += 1
 
-        old_bucket["local_depth"] += 1
-        if old_bucket["local_depth"] > self.global_depth:
-            print("aumentando profundidade global")
+        old_bucket.local_depth += 1
+        self._count_depth(old_local_depth, -1)
+        self._count_depth(old_local_depth + 1, 1)
+        if old_bucket.local_depth > self.global_depth:
             self.global_depth += 1
             self.directory = self.directory * 2
-            print(f"nova profundidade global: {self.global_depth}")
-
-        new_bucket_id = len(self.buckets)
-        new_bucket = {"local_depth": old_bucket["local_depth"], "items": []}
-        self.buckets.append(new_bucket)
-        diff_bit = 1 << (old_bucket["local_depth"] - 1)
-
-        for i in range(len(self.directory)):
-            if self.directory[i] == bucket_id and (i & diff_bit):
-                self.directory[i] = new_bucket_id
-
-        old_items = old_bucket["items"]
-        old_bucket["items"] = []
-        for (k, v) in old_items:
-            dir_index = self._get_directory_index(k)
-            b_id = self.directory[dir_index]
-            self.buckets[b_id]["items"].append((k, v))
-
-    def _shrink_directory_if_possible(self):
-        while self.global_depth > 1:
-            if any(b["local_depth"] == self.global_depth for b in self.buckets):
-                break
-            half = 1 << (self.global_depth - 1)
-            if self.directory[:half] == self.directory[half:]:
-                self.directory = self.directory[:half]
-                self.global_depth -= 1
+            if self.counters is not None:
+                self.counters["directory_grows"] += 1
+            if self._tracing:
+                self._trace("grow", global_depth=self.global_depth)
+
+        new_bucket_id = self._new_bucket(old_bucket.local_depth)
+        diff_bit = 1 << old_local_depth
+        pattern = dir_index & (diff_bit - 1)
+
+        for i in range(pattern | diff_bit, len(self.directory), diff_bit << 1):
+            self.directory[i] = new_bucket_id
+
+        old_items = list(self._chain_items(old_bucket))
+        self.buckets[bucket_id] = old_bucket = Bucket(old_bucket.local_depth)
+        new_bucket = self.buckets[new_bucket_id]
+        for k, v in old_items:
+            if self._hash(k) & diff_bit:
+                self._append(new_bucket, k, v)
             else:
-                break
+                self._append(old_bucket, k, v)
+
+    @staticmethod
+    def _chain_items(bucket):
+        while bucket is not None:
+            yield from zip(bucket.keys, bucket.values)
+            bucket = bucket.overflow
+
+    def _append(self, bucket, key, value):
+        """Coloca o item no primeiro nó da cadeia do bucket que tiver espaço."""
+        while len(bucket.keys) >= self.bucket_size:
+            if bucket.overflow is None:
+                bucket.overflow = Bucket(bucket.local_depth)
+            bucket = bucket.overflow
+        bucket.append(key, value)
+
+    def _can_split(self, bucket, key) -> bool:
+        """Dividir só ajuda se a profundidade permite e nem todas as chaves têm o mesmo hash."""
+        if bucket.local_depth >= self.max_depth:
+            return False
+        h = self._hash(key)
+        return any(self._hash(k) != h for k, _ in self._chain_items(bucket))
 
-    def _try_merge(self, bucket_id: int):
+    def _shrink_directory_if_possible(self):
+        # sem bucket com profundidade local == global, as duas metades do
+        # diretório são iguais e a de cima pode ser descartada
+        while self.global_depth > 1 and self.depth_counts[self.global_depth] == 0:
+            del self.directory[1 << (self.global_depth - 1):]
+            self.global_depth -= 1
+            if self.counters is not None:
+                self.counters["directory_shrinks"] += 1
+
+    def _try_merge(self, bucket_id: int, dir_index: int):
         while True:
             bucket = self.buckets[bucket_id]
-            ld = bucket["local_depth"]
+            ld = bucket.local_depth
 
-            if len(bucket["items"]) != 0 or ld == 0:
+            if len(bucket.keys) != 0 or ld == 0:
                 break
 
-            idxs = self._directory_indexes_for(bucket_id)
-            if not idxs:
-                break
-
-            i = idxs[0]
-            buddy_index = i ^ (1 << (ld - 1))
-            buddy_id = self.directory[buddy_index]
+            stride = 1 << ld
+            pattern = dir_index & (stride - 1)
+            buddy_id = self.directory[pattern ^ (stride >> 1)]
             buddy = self.buckets[buddy_id]
 
-            if buddy_id == bucket_id or buddy["local_depth"] != ld:
+            if buddy_id == bucket_id or buddy.local_depth != ld:
                 break
 
-            for di in idxs:
-                self.directory[di] = buddy_id
+            for i in range(pattern, len(self.directory), stride):
+                self.directory[i] = buddy_id
 
-            buddy["local_depth"] -= 1
-            bucket["items"].clear()
+            buddy.local_depth -= 1
+            if self.counters is not None:
+                self.counters["merges"] += 1
+            self._count_depth(ld, -2)
+            self._count_depth(ld - 1, 1)
+            self.buckets[bucket_id] = None
+            self._free_slots.append(bucket_id)
 
             self._shrink_directory_if_possible()
 
             bucket_id = buddy_id
+            dir_index = pattern
 
     def insert(self, key: int, value: any):
         """Insere um par (chave, valor) na estrutura."""
@@ -108,57 +450,302 @@ class ExtensibleHash:
             bucket_id = self.directory[dir_index]
             bucket = self.buckets[bucket_id]
 
-            bits = format(dir_index, f'0{self.global_depth}b')
-            print(f"Inserindo chave {key} no bucket {bucket_id} (dir index: {dir_index}, bits: {bits})")
+            if self._tracing:
+                self._trace("insert", key=key, bucket_id=bucket_id, dir_index=dir_index)
+            if self.counters is not None:
+                self._count_lookup(bucket)
 
             # se chave já existe, atualiza valor
-            for i, (k, v) in enumerate(bucket["items"]):
-                if k == key:
-                    bucket["items"][i] = (key, value)
+            node = bucket
+            while node is not None:
+                i = node.slots.get(key)
+                if i is not None:
+                    node.values[i] = value
                     return
+                node = node.overflow
+
+            if len(bucket.keys) < self.bucket_size:
+                bucket.append(key, value)
+                return
 
-            if len(bucket["items"]) < self.bucket_size:
-                bucket["items"].append((key, value))
+            if not self._can_split(bucket, key):
+                if self._tracing:
+                    self._trace("overflow", key=key, bucket_id=bucket_id)
+                if self.counters is not None:
+                    self.counters["overflow_inserts"] += 1
+                self._append(bucket, key, value)
                 return
 
             # bucket cheio, dividir
-            self._split_bucket(bucket_id)
+            self._split_bucket(bucket_id, dir_index)
             # tentar inserir novamente
 
     def search(self, key: int) -> any:
         """Retorna o valor associado à chave, se existir."""
         dir_index = self._get_directory_index(key)
-        bits = format(dir_index, f'0{self.global_depth}b')
         bucket_id = self.directory[dir_index]
         bucket = self.buckets[bucket_id]
+        if self.counters is not None:
+            self._count_lookup(bucket)
+
+        while bucket is not None:
+            i = bucket.slots.get(key)
+            if i is not None:
+                if self._tracing:
+                    self._trace("found", key=key, bucket_id=bucket_id, dir_index=dir_index)
+                return bucket.values[i]
+            bucket = bucket.overflow
+
+        if self._tracing:
+            self._trace("not_found", key=key)
+        return None
 
-        for (k, v) in bucket["items"]:
-            if k == key:
-                print(f"Chave {key} encontrada no bucket {bucket_id} (dir index: {dir_index}, bits: {bits})")
-                return v
+    def search_many(self, keys) -> list:
+        """Busca um lote de chaves (lista ou array NumPy).
 
-        print(f"Chave {key} não encontrada no bucket")
-        return None
+        Retorna os valores na ordem de keys (None para as ausentes). As
+        chaves são agrupadas pela entrada do diretório, então cada bucket é
+        resolvido uma única vez por lote.
+        """
+        keys = _as_list(keys)
+        if self._tracing or self.counters is not None:
+            return [self.search(key) for key in keys]
+
+        hash_func = self._hash
+        mask = (1 << self.global_depth) - 1
+        groups = {}
+        for pos, key in enumerate(keys):
+            groups.setdefault(hash_func(key) & mask, []).append(pos)
+
+        results = [None] * len(keys)
+        directory, buckets = self.directory, self.buckets
+        for dir_index, positions in groups.items():
+            bucket = buckets[directory[dir_index]]
+            for pos in positions:
+                key = keys[pos]
+                node = bucket
+                while node is not None:
+                    i = node.slots.get(key)
+                    if i is not None:
+                        results[pos] = node.values[i]
+                        break
+                    node = node.overflow
+        return results
+
+    def insert_many(self, pairs):
+        """Insere um lote de pares (chave, valor) agrupados pela entrada do diretório.
+
+        Chaves repetidas no lote ficam com o último valor, como em inserções
+        sucessivas. Só os pares que encontram o bucket cheio passam pelo
+        insert() normal (divisão ou overflow).
+        """
+        pairs = _as_list(pairs)
+        if self._tracing or self.counters is not None:
+            for key, value in pairs:
+                self.insert(key, value)
+            return
+
+        hash_func = self._hash
+        mask = (1 << self.global_depth) - 1
+        groups = {}
+        for key, value in pairs:
+            h = hash_func(key)
+            groups.setdefault(h & mask, []).append((h, key, value))
+
+        bucket_size = self.bucket_size
+        directory, buckets = self.directory, self.buckets
+        last = None
+        for group in groups.values():
+            for h, key, value in group:
+                # depois de uma divisão o diretório pode ter crescido
+                dir_index = h & mask
+                if dir_index != last:
+                    bucket = buckets[directory[dir_index]]
+                    last = dir_index
+
+                node = bucket
+                while node is not None:
+                    i = node.slots.get(key)
+                    if i is not None:
+                        node.values[i] = value
+                        break
+                    node = node.overflow
+                else:
+                    if len(bucket.keys) < bucket_size:
+                        bucket.append(key, value)
+                    else:
+                        self.insert(key, value)
+                        mask = (1 << self.global_depth) - 1
+                        directory = self.directory
+                        last = None
 
     def remove(self, key: int) -> bool:
         """Remove o registro com a chave informada e tenta mesclar buckets vazios."""
         dir_index = self._get_directory_index(key)
-        bits = format(dir_index, f'0{self.global_depth}b')
         bucket_id = self.directory[dir_index]
         bucket = self.buckets[bucket_id]
-
-        for i, (k, v) in enumerate(bucket["items"]):
-            if k == key:
-                del bucket["items"][i]
-                print(f"Chave {key} removida do bucket {bucket_id} (dir index: {dir_index}, bits: {bits})")
-
-                if len(bucket["items"]) == 0:
-                    self._try_merge(bucket_id)
+        if self.counters is not None:
+            self._count_lookup(bucket)
+
+        node, prev = bucket, None
+        while node is not None:
+            i = node.slots.get(key)
+            if i is not None:
+                node.remove_at(i)
+                if self._tracing:
+                    self._trace("removed", key=key, bucket_id=bucket_id, dir_index=dir_index)
+                self._compact_chain(node, prev)
+
+                if len(bucket.keys) == 0:
+                    self._try_merge(bucket_id, dir_index)
                 return True
+            prev, node = node, node.overflow
 
-        print(f"Chave {key} não encontrada para remoção")
+        if self._tracing:
+            self._trace("remove_missing", key=key)
         return False
 
+    @staticmethod
+    def _compact_chain(node, prev):
+        """Depois de uma remoção, puxa um item do fim da cadeia para preencher o nó."""
+        if node.overflow is not None:
+            last, last_prev = node.overflow, node
+            while last.overflow is not None:
+                last_prev, last = last, last.overflow
+            node.append(*last.pop())
+            if not last.keys:
+                last_prev.overflow = None
+        elif prev is not None and not node.keys:
+            prev.overflow = None
+
+    def items(self):
+        """Gera todos os pares (chave, valor) armazenados, bucket a bucket."""
+        for bucket in self.buckets:
+            if bucket is not None:
+                yield from self._chain_items(bucket)
+
+    def directory_stats(self) -> dict:
+        """Estatísticas do diretório e da ocupação dos buckets."""
+        live = sum(self.depth_counts)
+        items = 0
+        overflow_nodes = 0
+        overflow_items = 0
+        for bucket in self.buckets:
+            if bucket is None:
+                continue
+            items += len(bucket)
+            node = bucket.overflow
+            while node is not None:
+                overflow_nodes += 1
+                overflow_items += len(node)
+                node = node.overflow
+        items += overflow_items
+        return {
+            "global_depth": self.global_depth,
+            "directory_size": len(self.directory),
+            "buckets": live,
+            "directory_to_bucket_ratio": len(self.directory) / live,
+            "items": items,
+            "load_factor": items / (live * self.bucket_size),
+            "overflow_buckets": overflow_nodes,
+            "overflow_items": overflow_items,
+            "local_depths": {d: n for d, n in enumerate(self.depth_counts) if n},
+        }
+
+    def stats(self) -> dict:
+        """Estatísticas estruturais (directory_stats) mais a ocupação dos buckets.
+
+        bucket_fill_histogram conta os buckets por ocupação do nó principal
+        em 10 faixas de 0.1 (chave = limite inferior); chain_lengths conta
+        os buckets pelo tamanho da cadeia (1 = sem overflow). Inclui os
+        contadores quando ligados.
+        """
+        stats = self.directory_stats()
+        histogram = [0] * 10
+        chains = Counter()
+        for bucket in self.buckets:
+            if bucket is None:
+                continue
+            histogram[min(9, int(len(bucket) / self.bucket_size * 10))] += 1
+            length = 0
+            node = bucket
+            while node is not None:
+                length += 1
+                node = node.overflow
+            chains[length] += 1
+        stats["bucket_size"] = self.bucket_size
+        stats["bucket_fill_histogram"] = {f"{i / 10:.1f}": c for i, c in enumerate(histogram)}
+        stats["chain_lengths"] = dict(sorted(chains.items()))
+        if self.counters is not None:
+            stats["counters"] = dict(self.counters)
+        return stats
+
+    def save(self, path):
+        """Grava a tabela em path no formato de snapshot (ver SNAPSHOT_HEADER).
+
+        A função de hash não vai no arquivo, só o nome dela e o hash de
+        uma amostra das chaves: load() precisa receber a mesma função, e
+        um hash que muda entre processos (como hash() de str) é recusado lá.
+        """
+        if self.max_depth >= _FREE_SLOT:
+            raise ValueError(f"max_depth acima de {_FREE_SLOT - 1} não cabe no snapshot")
+        depths = bytearray(_FREE_SLOT if b is None else b.local_depth for b in self.buckets)
+        chain_keys, chain_values = [], []
+        for bucket in self.buckets:
+            ks, vs = [], []
+            while bucket is not None:
+                ks += bucket.keys
+                vs += bucket.values
+                bucket = bucket.overflow
+            chain_keys.append(ks)
+            chain_values.append(vs)
+        try:
+            keys = array("q")
+            key_offsets = array("Q", [0])
+            for ks in chain_keys:
+                keys.extend(ks)
+                key_offsets.append(len(keys))
+            int_keys = True
+        except (TypeError, OverflowError):
+            blobs = [pickle.dumps(ks, pickle.HIGHEST_PROTOCOL) for ks in chain_keys]
+            keys, key_offsets, int_keys = b"".join(blobs), _blob_offsets(blobs), False
+        values = [pickle.dumps(vs, pickle.HIGHEST_PROTOCOL) for vs in chain_values]
+        filled = [ks for ks in chain_keys if ks]
+        step = max(1, len(filled) // _HASH_SAMPLE)
+        sample = [(ks[0], self._hash(ks[0])) for ks in filled[::step][:_HASH_SAMPLE]]
+
+        hash_name = getattr(self._hash, "__name__", "").encode()[:32]
+        fields = (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _SNAP_INT_KEYS if int_keys else 0, self.bucket_size,
+                  self.max_depth, self.global_depth, len(self.buckets), hash_name)
+        _write_sections(path, SNAPSHOT_HEADER, fields,
+                        [array("I", self.directory), depths, key_offsets, keys, _blob_offsets(values),
+                         b"".join(values), pickle.dumps(sample, pickle.HIGHEST_PROTOCOL)])
+
+    @classmethod
+    def load(cls, path, hash_func=None, verbose: bool = False, on_event=None):
+        """Abre um snapshot gravado por save() sem ler os buckets.
+
+        O arquivo é mapeado e só o diretório é copiado; cada bucket é lido
+        do mapa no primeiro acesso, então as consultas começam logo, em
+        tempo que quase não depende do tamanho da tabela. A tabela carregada
+        aceita escritas normalmente (o arquivo não é alterado).
+        """
+        snapshot = _Snapshot(path)
+        table = cls(snapshot.bucket_size, verbose, on_event, hash_func, snapshot.max_depth)
+        name = getattr(table._hash, "__name__", "")
+        if name != snapshot.hash_name:
+            raise ValueError(f"snapshot gravado com o hash {snapshot.hash_name!r}, não {name!r}")
+        for key, h in snapshot.hash_sample:
+            if table._hash(key) != h:
+                raise ValueError(f"o hash de {key!r} mudou desde o save (hash que varia entre processos?)")
+        depths = snapshot.depths.tobytes()
+        table.global_depth = snapshot.global_depth
+        table.directory = snapshot.directory.tolist()
+        table.buckets = [None if d == _FREE_SLOT else snapshot.bucket(i) for i, d in enumerate(depths)]
+        table.depth_counts = [depths.count(d) for d in range(table.global_depth + 1)]
+        table._free_slots = [i for i, d in enumerate(depths) if d == _FREE_SLOT]
+        return table
+
     def seed(self, n: int):
         if n <= 0:
             print("Inserir > 0.")
@@ -185,12 +772,16 @@ class ExtensibleHash:
         print("\nBuckets:")
         for i, bucket in enumerate(self.buckets):
             if refcount[i] > 0:
-                print(f"Bucket {i}: Profundidade Local: {bucket['local_depth']}, Itens: {bucket['items']}")
+                print(f"Bucket {i}: Profundidade Local: {bucket.local_depth}, Itens: {bucket.items()}")
+                node = bucket.overflow
+                while node is not None:
+                    print(f"    overflow: {node.items()}")
+                    node = node.overflow
 
 def main():
     print("Hash Extensível\n")
     bucket_size = int(input("tamanho máximo itens por bucket: "))
-    hash = ExtensibleHash(bucket_size)
+    hash = ExtensibleHash(bucket_size, verbose=True, hash_func=identity_hash)
 
     while True:
         print("\n1. Inserir\n2. Buscar\n3. Remover\n4. Exibir\n5. Sair\n6. Seed (popular)")
@@ -0,0 +1,67 @@
+import argparse
+import random
+import time
+
+from ExtensibleHash import ExtensibleHash
+
+# Benchmark do custo das operações em função do tamanho do bucket.
+# Para cada bucket_size insere n chaves, busca todas (acertos), busca n
+# chaves ausentes (falhas) e remove metade, reportando o tempo médio por
+# operação em microssegundos. Como a busca dentro do bucket usa o índice
+# chave -> posição, o custo deve ficar praticamente constante.
+BUCKET_SIZES = [4, 16, 64, 256, 1024, 4096]
+
+
+def run(bucket_size, keys, missing):
+    h = ExtensibleHash(bucket_size)
+
+    start = time.perf_counter()
+    for k in keys:
+        h.insert(k, k)
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in keys:
+        h.search(k)
+    hit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in missing:
+        h.search(k)
+    miss_time = time.perf_counter() - start
+
+    to_remove = keys[: len(keys) // 2]
+    start = time.perf_counter()
+    for k in to_remove:
+        h.remove(k)
+    remove_time = time.perf_counter() - start
+
+    n = len(keys)
+    return (
+        insert_time / n * 1e6,
+        hit_time / n * 1e6,
+        miss_time / len(missing) * 1e6,
+        remove_time / max(1, len(to_remove)) * 1e6,
+        len(h.directory),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do hash extensível por tamanho de bucket")
+    parser.add_argument("-n", type=int, default=100_000, help="quantidade de chaves")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    universe = rng.sample(range(args.n * 20), args.n * 2)
+    keys, missing = universe[: args.n], universe[args.n:]
+
+    print(f"n = {args.n} chaves (tempo médio por operação, µs)")
+    print(f"{'bucket':>7} {'insert':>9} {'hit':>9} {'miss':>9} {'remove':>9} {'diretório':>10}")
+    for bucket_size in BUCKET_SIZES:
+        ins, hit, miss, rem, directory = run(bucket_size, keys, missing)
+        print(f"{bucket_size:>7} {ins:>9.2f} {hit:>9.2f} {miss:>9.2f} {rem:>9.2f} {directory:>10}")
+
+
+if __name__ == "__main__":
+    main()
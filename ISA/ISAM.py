@@ -0,0 +1,185 @@
+from bisect import bisect_left
+import heapq
+
+_DELETED = object()
+
+
+class ISAMIndex:
+    """Índice ISAM estático construído sobre dados ordenados.
+
+    As chaves ficam em listas contíguas (keys/values) divididas em páginas
+    de page_size entradas. O índice é o vetor com a primeira chave de cada
+    página no layout de Eytzinger (ordem de uma busca em largura), então a
+    busca da página é um laço sem desvios: i = 2*i + (chave >= fence[i]).
+
+    Depois da construção as páginas primárias não mudam: inserções de
+    chaves novas vão para a área de overflow da página (lista ordenada) e
+    remoções de chaves primárias deixam uma marca de removido. Quando o
+    overflow passa de reorganize_threshold * entradas primárias, o índice
+    é reconstruído (reorganize()).
+    """
+
+    def __init__(self, items=(), page_size: int = 64, reorganize_threshold: float = 0.25):
+        if page_size < 1:
+            raise ValueError("page_size deve ser >= 1")
+        self.page_size = page_size
+        self.reorganize_threshold = reorganize_threshold
+        self.reorganizations = 0
+        self._build(items)
+
+    def _build(self, items):
+        keys = []
+        values = []
+        for key, value in items:
+            if keys and key <= keys[-1]:
+                raise ValueError(f"entrada não ordenada ou repetida: {key} depois de {keys[-1]}")
+            keys.append(key)
+            values.append(value)
+        self.keys = keys
+        self.values = values
+        self.deleted = 0
+
+        n_pages = max(1, -(-len(keys) // self.page_size))
+        self.n_pages = n_pages
+        self.overflow = [[] for _ in range(n_pages)]   # (chave, valor) ordenados por página
+        self.overflow_count = 0
+
+        # Eytzinger 1-indexado: fences[i] é a primeira chave da página ranks[i]
+        fences = keys[::self.page_size]
+        self.fences = [None] * (len(fences) + 1)
+        self.ranks = [0] * (len(fences) + 1)
+        self._fill_eytzinger(fences)
+
+    def _fill_eytzinger(self, fences):
+        # percorre a árvore implícita em ordem simétrica com pilha explícita
+        n = len(fences)
+        rank = 0
+        stack = []
+        i = 1
+        while stack or i <= n:
+            while i <= n:
+                stack.append(i)
+                i = 2 * i
+            i = stack.pop()
+            self.fences[i] = fences[rank]
+            self.ranks[i] = rank
+            rank += 1
+            i = 2 * i + 1
+
+    def _page_of(self, key) -> int:
+        """Página cuja primeira chave é a maior <= key (0 se key é menor que todas)."""
+        fences = self.fences
+        n = len(fences) - 1
+        i = 1
+        while i <= n:
+            i = 2 * i + (key >= fences[i])
+        # remove os bits 1 finais e o último 0: i vira a primeira fence > key
+        i >>= (~i & (i + 1)).bit_length()
+        page = (self.ranks[i] if i else n) - 1
+        return page if page > 0 else 0
+
+    def _page_bounds(self, page):
+        start = page * self.page_size
+        return start, min(start + self.page_size, len(self.keys))
+
+    def _find_primary(self, key, page):
+        start, end = self._page_bounds(page)
+        i = bisect_left(self.keys, key, start, end)
+        if i < end and self.keys[i] == key:
+            return i
+        return -1
+
+    def search(self, key):
+        """Busca um valor pela chave."""
+        page = self._page_of(key)
+        i = self._find_primary(key, page)
+        if i >= 0:
+            value = self.values[i]
+            return None if value is _DELETED else value
+        chain = self.overflow[page]
+        j = bisect_left(chain, (key,))
+        if j < len(chain) and chain[j][0] == key:
+            return chain[j][1]
+        return None
+
+    def insert(self, key, value):
+        """Insere ou atualiza; chaves novas vão para o overflow da página."""
+        page = self._page_of(key)
+        i = self._find_primary(key, page)
+        if i >= 0:
+            if self.values[i] is _DELETED:
+                self.deleted -= 1
+            self.values[i] = value
+            return
+        chain = self.overflow[page]
+        j = bisect_left(chain, (key,))
+        if j < len(chain) and chain[j][0] == key:
+            chain[j] = (key, value)
+            return
+        chain.insert(j, (key, value))
+        self.overflow_count += 1
+        if self.overflow_ratio > self.reorganize_threshold:
+            self.reorganize()
+
+    def remove(self, key):
+        """Remove uma chave; retorna True se ela existia."""
+        page = self._page_of(key)
+        i = self._find_primary(key, page)
+        if i >= 0:
+            if self.values[i] is _DELETED:
+                return False
+            self.values[i] = _DELETED
+            self.deleted += 1
+            return True
+        chain = self.overflow[page]
+        j = bisect_left(chain, (key,))
+        if j < len(chain) and chain[j][0] == key:
+            del chain[j]
+            self.overflow_count -= 1
+            return True
+        return False
+
+    @property
+    def overflow_ratio(self) -> float:
+        return self.overflow_count / max(1, len(self.keys))
+
+    def reorganize(self):
+        """Reconstrói as páginas primárias e o índice com o overflow incorporado."""
+        self._build(list(self.items()))
+        self.reorganizations += 1
+
+    def _page_items(self, page):
+        start, end = self._page_bounds(page)
+        primary = ((k, v) for k, v in zip(self.keys[start:end], self.values[start:end]) if v is not _DELETED)
+        if not self.overflow[page]:
+            return primary
+        return heapq.merge(primary, self.overflow[page], key=lambda item: item[0])
+
+    def items(self):
+        """Gera os pares (chave, valor) em ordem."""
+        for page in range(self.n_pages):
+            yield from self._page_items(page)
+
+    def range(self, lo, hi):
+        """Pares com lo <= chave <= hi, em ordem."""
+        for page in range(self._page_of(lo), self.n_pages):
+            for key, value in self._page_items(page):
+                if key > hi:
+                    return
+                if key >= lo:
+                    yield key, value
+
+    def __len__(self):
+        return len(self.keys) - self.deleted + self.overflow_count
+
+    def display(self):
+        """Mostra as páginas primárias e seus overflows."""
+        print(f"\nISAM: {self.n_pages} páginas, overflow {self.overflow_count} "
+              f"({self.overflow_ratio:.0%} das entradas primárias)")
+        for page in range(self.n_pages):
+            start, end = self._page_bounds(page)
+            primary = [k for k, v in zip(self.keys[start:end], self.values[start:end]) if v is not _DELETED]
+            print(f"Página {page}: {primary}", end="")
+            if self.overflow[page]:
+                print(f" | overflow: {[k for k, _ in self.overflow[page]]}", end="")
+            print()
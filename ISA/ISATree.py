@@ -1,84 +1,530 @@
+import math
+import mmap
+import os
+import pickle
+import random
+import struct
+from array import array
+from collections import Counter
+
+
 class Node:
     """Representa um nó da árvore ISA."""
+    __slots__ = ("key", "value", "left", "right", "height", "size", "priority")
+
     def __init__(self, key, value):
         self.key = key
         self.value = value
         self.left = None
         self.right = None
+        self.height = 1
+        self.size = 1  # nós na subárvore (para rank/select)
+        self.priority = None
+
+
+def _height(node):
+    return node.height if node else 0
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _as_list(seq):
+    """Lote como lista; tolist() converte arrays NumPy (e seus escalares)."""
+    return seq.tolist() if hasattr(seq, "tolist") else list(seq)
+
+
+# Snapshot (save/load): arrays planos com os nós numerados em ordem de
+# largura (a raiz é o nó 0 e o topo da árvore fica no começo do arquivo).
+#   cabeçalho     : SNAPSHOT_HEADER, seguido de (offset, tamanho) das seções
+#   left, right   : int64 por nó, índice do filho (-1 = nenhum)
+#   height        : int32 por nó
+#   size          : int64 por nó
+#   priority      : float64 por nó (só no treap)
+#   key_offsets   : páginas + 1 u64, início de cada página em keys (chaves não inteiras)
+#   keys          : chaves int64 (flag _SNAP_INT_KEYS) ou um pickle por página
+#   value_offsets : páginas + 1 u64, início de cada página em values
+#   values        : um pickle por página com os valores dos seus nós
+# Uma página são SNAPSHOT_PAGE nós consecutivos. load() mapeia o arquivo e
+# devolve a árvore com só a raiz "vazia": cada nó é lido do mapa no primeiro
+# acesso, e o pickle de uma página é decodificado quando o primeiro nó dela
+# é lido.
+SNAPSHOT_MAGIC = b"ISAS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PAGE = 256
+SNAPSHOT_SECTIONS = ("left", "right", "height", "size", "priority", "key_offsets", "keys",
+                     "value_offsets", "values")
+# magic, versão, flags, balanceamento, nós, seções
+SNAPSHOT_HEADER = struct.Struct("<4sHH8sq" + "qq" * len(SNAPSHOT_SECTIONS))
+_SNAP_INT_KEYS = 1
+
+
+def _pages(items):
+    """Pickle de cada página de SNAPSHOT_PAGE itens: (offsets, blob)."""
+    offsets = array("Q", [0])
+    blobs = []
+    for start in range(0, len(items), SNAPSHOT_PAGE):
+        blobs.append(pickle.dumps(items[start:start + SNAPSHOT_PAGE], pickle.HIGHEST_PROTOCOL))
+        offsets.append(offsets[-1] + len(blobs[-1]))
+    return offsets, b"".join(blobs)
+
+
+def _write_sections(path, header, fields, sections):
+    """Grava cabeçalho e seções (alinhadas em 8 bytes) num temporário e renomeia."""
+    layout = []
+    offset = header.size
+    for data in sections:
+        offset += -offset % 8
+        size = memoryview(data).nbytes
+        layout += [offset, size]
+        offset += size
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.pack(*fields, *layout))
+        for data, start in zip(sections, layout[::2]):
+            f.write(b"\0" * (start - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _LazyNode(Node):
+    """Nó de um snapshot ainda não lido: o primeiro acesso a um campo carrega o nó."""
+    __slots__ = ("_pages", "_page")
+
+    def __getattr__(self, name):
+        pages = self._pages
+        if pages is None:
+            raise AttributeError(name)
+        pages.materialize(self)
+        return getattr(self, name)
+
+
+class _Snapshot:
+    """Snapshot aberto: o mapa do arquivo, as seções e as páginas já decodificadas."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < SNAPSHOT_HEADER.size:
+            raise ValueError(f"{path}: arquivo curto demais para um snapshot")
+        magic, version, flags, balance, self.node_count, *layout = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path}: não é um snapshot de ISATree")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path}: versão de snapshot {version} não suportada")
+        self.balance = balance.rstrip(b"\0").decode() or None
+        self.int_keys = bool(flags & _SNAP_INT_KEYS)
+        view = memoryview(self.map)
+        sections = {name: view[start:start + size]
+                    for name, start, size in zip(SNAPSHOT_SECTIONS, layout[::2], layout[1::2])}
+        self.left = sections["left"].cast("q")
+        self.right = sections["right"].cast("q")
+        self.height = sections["height"].cast("i")
+        self.size = sections["size"].cast("q")
+        self.priority = sections["priority"].cast("d") if self.balance == "treap" else None
+        self.key_offsets = sections["key_offsets"].cast("Q")
+        self.keys = sections["keys"].cast("q") if self.int_keys else sections["keys"]
+        self.value_offsets = sections["value_offsets"].cast("Q")
+        self.values = sections["values"]
+        self.key_pages = {}
+        self.value_pages = {}
+
+    def node(self, i):
+        if i < 0:
+            return None
+        stub = _LazyNode.__new__(_LazyNode)
+        stub._pages = self
+        stub._page = i
+        return stub
+
+    @staticmethod
+    def _page(cache, offsets, blob, page):
+        items = cache.get(page)
+        if items is None:
+            items = cache[page] = pickle.loads(blob[offsets[page]:offsets[page + 1]])
+        return items
+
+    def materialize(self, stub):
+        i = stub._page
+        page, slot = divmod(i, SNAPSHOT_PAGE)
+        if self.int_keys:
+            stub.key = self.keys[i]
+        else:
+            stub.key = self._page(self.key_pages, self.key_offsets, self.keys, page)[slot]
+        stub.value = self._page(self.value_pages, self.value_offsets, self.values, page)[slot]
+        stub.left = self.node(self.left[i])
+        stub.right = self.node(self.right[i])
+        stub.height = self.height[i]
+        stub.size = self.size[i]
+        stub.priority = self.priority[i] if self.priority is not None else None
+        stub._pages = None
 
 
 class ISATree:
-    """Implementação simples de uma árvore ISA (índice secundário agrupado)."""
+    """Implementação simples de uma árvore ISA (índice secundário agrupado).
 
-    def __init__(self):
+    balance escolhe o balanceamento: None (BST simples, como antes), "avl"
+    ou "treap". Todas as operações são iterativas (sem limite de recursão);
+    AVL e treap mantêm a altura O(log n) mesmo com chaves ordenadas.
+    """
+
+    BALANCE_MODES = (None, "avl", "treap")
+
+    def __init__(self, balance=None, seed=None):
+        if balance not in self.BALANCE_MODES:
+            raise ValueError(f"balanceamento inválido: {balance!r} (use {self.BALANCE_MODES})")
         self.root = None
+        self.balance = balance
+        self._rng = random.Random(seed)
+        # contadores de eventos (buscas, nós visitados, comparações,
+        # rotações) enquanto ligados por enable_counters(); None = desligados
+        self.counters = None
 
-    def insert(self, key, value):
-        """Insere um par chave-valor na árvore."""
-        if self.root is None:
-            self.root = Node(key, value)
-        else:
-            self._insert(self.root, key, value)
+    def enable_counters(self):
+        """Liga os contadores (Counter) e os devolve."""
+        self.counters = Counter()
+        return self.counters
 
-    def _insert(self, node, key, value):
-        if key == node.key:
-            node.value = value  # Atualiza valor se a chave já existir
-        elif key < node.key:
-            if node.left:
-                self._insert(node.left, key, value)
-            else:
-                node.left = Node(key, value)
+    def disable_counters(self):
+        self.counters = None
+
+    def _count_descent(self, steps, found):
+        """Conta uma descida de steps passos pelo caminho: cada passo custa 2 comparações (== e <) e o nó achado, 1 (==)."""
+        counters = self.counters
+        counters["lookups"] += 1
+        counters["nodes_visited"] += steps + found
+        counters["comparisons"] += 2 * steps + found
+
+    def _search_counted(self, key):
+        """search com os contadores ligados, contando na própria descida."""
+        steps = 0
+        node = self.root
+        while node:
+            if key == node.key:
+                self._count_descent(steps, True)
+                return node.value
+            steps += 1
+            node = node.left if key < node.key else node.right
+        self._count_descent(steps, False)
+        return None
+
+    def _update(self, node):
+        node.height = 1 + max(_height(node.left), _height(node.right))
+        node.size = 1 + _size(node.left) + _size(node.right)
+
+    def _rotate_right(self, node):
+        if self.counters is not None:
+            self.counters["rotations"] += 1
+        pivot = node.left
+        node.left = pivot.right
+        pivot.right = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotate_left(self, node):
+        if self.counters is not None:
+            self.counters["rotations"] += 1
+        pivot = node.right
+        node.right = pivot.left
+        pivot.left = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _avl_rebalance(self, node):
+        """Atualiza a altura e faz as rotações AVL; devolve a nova raiz da subárvore."""
+        self._update(node)
+        balance = _height(node.left) - _height(node.right)
+        if balance > 1:
+            if _height(node.left.left) < _height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if _height(node.right.right) < _height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def _replace_child(self, path, depth, subtree):
+        """Liga subtree no lugar do nó que estava na profundidade depth do caminho."""
+        if depth == 0:
+            self.root = subtree
         else:
-            if node.right:
-                self._insert(node.right, key, value)
+            parent, went_left = path[depth - 1]
+            if went_left:
+                parent.left = subtree
+            else:
+                parent.right = subtree
+
+    def _fix_path(self, path, start=None):
+        """Sobe pelo caminho (de baixo para cima) atualizando alturas e, no AVL, rebalanceando."""
+        if start is None:
+            start = len(path) - 1
+        for depth in range(start, -1, -1):
+            node = path[depth][0]
+            if self.balance == "avl":
+                subtree = self._avl_rebalance(node)
+                if subtree is not node:
+                    self._replace_child(path, depth, subtree)
             else:
-                node.right = Node(key, value)
+                self._update(node)
+
+    def insert(self, key, value):
+        """Insere um par chave-valor na árvore."""
+        path = []  # (nó, foi para a esquerda)
+        node = self.root
+        while node:
+            if key == node.key:
+                if self.counters is not None:
+                    self._count_descent(len(path), True)
+                node.value = value  # Atualiza valor se a chave já existir
+                return
+            went_left = key < node.key
+            path.append((node, went_left))
+            node = node.left if went_left else node.right
+        if self.counters is not None:
+            self._count_descent(len(path), False)
+
+        new = Node(key, value)
+        self._replace_child(path, len(path), new)
+
+        depth = len(path)
+        if self.balance == "treap":
+            # max-heap nas prioridades: sobe o nó novo com rotações
+            new.priority = self._rng.random()
+            while depth > 0 and new.priority > path[depth - 1][0].priority:
+                parent, went_left = path[depth - 1]
+                subtree = self._rotate_right(parent) if went_left else self._rotate_left(parent)
+                self._replace_child(path, depth - 1, subtree)
+                depth -= 1
+        self._fix_path(path, depth - 1)
 
     def search(self, key):
         """Busca um valor pela chave."""
-        return self._search(self.root, key)
+        if self.counters is not None:
+            return self._search_counted(key)
+        node = self.root
+        while node:
+            if key == node.key:
+                return node.value
+            node = node.left if key < node.key else node.right
+        return None
 
-    def _search(self, node, key):
-        if not node:
-            return None
-        if key == node.key:
-            return node.value
-        elif key < node.key:
-            return self._search(node.left, key)
-        else:
-            return self._search(node.right, key)
+    def search_many(self, keys):
+        """Busca um lote de chaves (lista ou array NumPy); retorna os valores na ordem de keys."""
+        if self.counters is not None:
+            return [self.search(key) for key in _as_list(keys)]
+        results = []
+        root = self.root
+        for key in _as_list(keys):
+            node = root
+            while node and key != node.key:
+                node = node.left if key < node.key else node.right
+            results.append(node.value if node else None)
+        return results
+
+    def insert_many(self, pairs):
+        """Insere um lote de pares (chave, valor) na ordem do lote.
+
+        O lote não é ordenado: na árvore sem balanceamento, chaves em ordem
+        crescente degenerariam a árvore em uma lista.
+        """
+        for key, value in _as_list(pairs):
+            self.insert(key, value)
 
     def remove(self, key):
-        """Remove uma chave da árvore."""
-        self.root = self._remove(self.root, key)
+        """Remove uma chave da árvore; retorna True se ela existia."""
+        path = []
+        node = self.root
+        while node and key != node.key:
+            went_left = key < node.key
+            path.append((node, went_left))
+            node = node.left if went_left else node.right
+        if self.counters is not None:
+            self._count_descent(len(path), node is not None)
+        if node is None:
+            return False
 
-    def _remove(self, node, key):
-        if not node:
-            return None
-        if key < node.key:
-            node.left = self._remove(node.left, key)
-        elif key > node.key:
-            node.right = self._remove(node.right, key)
-        else:
-            # Caso 1: nó sem filhos
-            if not node.left and not node.right:
-                return None
-            # Caso 2: um filho
-            if not node.left:
-                return node.right
-            if not node.right:
-                return node.left
-            # Caso 3: dois filhos — substitui pelo menor da subárvore direita
-            min_larger_node = self._min_value_node(node.right)
-            node.key, node.value = min_larger_node.key, min_larger_node.value
-            node.right = self._remove(node.right, min_larger_node.key)
-        return node
+        # Caso 3: dois filhos — substitui pelo menor da subárvore direita
+        # (mantém a ordem de heap do treap: só a chave muda de lugar)
+        if node.left and node.right:
+            path.append((node, False))
+            successor = node.right
+            while successor.left:
+                path.append((successor, True))
+                successor = successor.left
+            node.key, node.value = successor.key, successor.value
+            node = successor
 
-    def _min_value_node(self, node):
-        current = node
-        while current.left:
-            current = current.left
-        return current
+        # Casos 1 e 2: nenhum ou um filho — o filho ocupa o lugar do nó
+        self._replace_child(path, len(path), node.left or node.right)
+        self._fix_path(path)
+        return True
+
+    def height(self):
+        return _height(self.root)
+
+    def __len__(self):
+        return _size(self.root)
+
+    def items(self):
+        """Gera os pares (chave, valor) em ordem."""
+        return self.range()
+
+    def range(self, lo=None, hi=None):
+        """Gera os pares com lo <= chave <= hi em ordem (None = sem limite).
+
+        Usa pilha explícita, então a memória é O(altura) e a geração é
+        preguiçosa: nada além do próximo par é calculado.
+        """
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                if lo is not None and node.key < lo:
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if hi is not None and node.key > hi:
+                return
+            yield node.key, node.value
+            node = node.right
+
+    def floor(self, key):
+        """Par com a maior chave <= key, ou None."""
+        best = None
+        node = self.root
+        while node:
+            if key == node.key:
+                return node.key, node.value
+            if key < node.key:
+                node = node.left
+            else:
+                best = node
+                node = node.right
+        return (best.key, best.value) if best else None
+
+    def ceiling(self, key):
+        """Par com a menor chave >= key, ou None."""
+        best = None
+        node = self.root
+        while node:
+            if key == node.key:
+                return node.key, node.value
+            if key > node.key:
+                node = node.right
+            else:
+                best = node
+                node = node.left
+        return (best.key, best.value) if best else None
+
+    def rank(self, key):
+        """Quantidade de chaves menores que key."""
+        rank = 0
+        node = self.root
+        while node:
+            if key <= node.key:
+                node = node.left
+            else:
+                rank += _size(node.left) + 1
+                node = node.right
+        return rank
+
+    def select(self, i):
+        """Par com a i-ésima menor chave (a partir de 0)."""
+        if not 0 <= i < _size(self.root):
+            raise IndexError(f"posição fora da árvore: {i}")
+        node = self.root
+        while True:
+            left = _size(node.left)
+            if i < left:
+                node = node.left
+            elif i == left:
+                return node.key, node.value
+            else:
+                i -= left + 1
+                node = node.right
+
+    def stats(self):
+        """Estatísticas estruturais: altura, chaves e distribuição de profundidade.
+
+        depth_histogram conta os nós por profundidade (raiz = 1), então
+        avg_depth é a média de nós visitados numa busca que encontra a
+        chave. Inclui os contadores quando ligados.
+        """
+        depths = Counter()
+        stack = [(self.root, 1)] if self.root else []
+        while stack:
+            node, depth = stack.pop()
+            depths[depth] += 1
+            if node.left:
+                stack.append((node.left, depth + 1))
+            if node.right:
+                stack.append((node.right, depth + 1))
+        keys = _size(self.root)
+        stats = {
+            "height": self.height(),
+            "keys": keys,
+            "balance": self.balance or "bst",
+            "avg_depth": sum(d * c for d, c in depths.items()) / keys if keys else 0.0,
+            "depth_histogram": dict(sorted(depths.items())),
+        }
+        if self.counters is not None:
+            stats["counters"] = dict(self.counters)
+        return stats
+
+    def save(self, path):
+        """Grava a árvore em path no formato de snapshot (ver SNAPSHOT_HEADER)."""
+        nodes = [self.root] if self.root else []
+        left, right = array("q"), array("q")
+        # a lista cresce durante o laço: os filhos entram no fim (ordem de largura)
+        for node in nodes:
+            for child, ids in ((node.left, left), (node.right, right)):
+                if child:
+                    ids.append(len(nodes))
+                    nodes.append(child)
+                else:
+                    ids.append(-1)
+        try:
+            keys = array("q", [node.key for node in nodes])
+            key_offsets, int_keys = array("Q"), True
+        except (TypeError, OverflowError):
+            key_offsets, keys = _pages([node.key for node in nodes])
+            int_keys = False
+        value_offsets, values = _pages([node.value for node in nodes])
+        priority = array("d")
+        if self.balance == "treap":
+            priority.extend(math.nan if node.priority is None else node.priority for node in nodes)
+
+        fields = (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _SNAP_INT_KEYS if int_keys else 0,
+                  (self.balance or "").encode(), len(nodes))
+        _write_sections(path, SNAPSHOT_HEADER, fields,
+                        [left, right, array("i", [node.height for node in nodes]),
+                         array("q", [node.size for node in nodes]), priority,
+                         key_offsets, keys, value_offsets, values])
+
+    @classmethod
+    def load(cls, path, seed=None):
+        """Abre um snapshot gravado por save() sem ler os nós.
+
+        O arquivo é mapeado e a árvore começa só com a raiz; cada nó é lido
+        do mapa no primeiro acesso, então as consultas começam logo, em
+        tempo que não depende do tamanho da árvore. A árvore carregada
+        aceita escritas normalmente (o arquivo não é alterado); seed é a
+        semente das prioridades de novos nós do treap.
+        """
+        snapshot = _Snapshot(path)
+        tree = cls(balance=snapshot.balance, seed=seed)
+        tree.root = snapshot.node(0) if snapshot.node_count else None
+        return tree
 
     def display(self):
         """Mostra a árvore (ordem simétrica)."""
@@ -86,15 +532,10 @@ class ISATree:
             print("Árvore vazia.")
             return
         print("\nÁrvore ISA (em ordem):")
-        self._inorder(self.root)
+        for key, value in self.items():
+            print(f"{key}: {value}", end=" | ")
         print("\n")
 
-    def _inorder(self, node):
-        if node:
-            self._inorder(node.left)
-            print(f"{node.key}: {node.value}", end=" | ")
-            self._inorder(node.right)
-
 
 # ========== MENU INTERATIVO ==========
 def menu():
@@ -133,8 +574,10 @@ def menu():
         elif opcao == "3":
             try:
                 chave = int(input("Digite a chave a remover: "))
-                isa.remove(chave)
-                print(f"Chave {chave} removida (se existia).")
+                if isa.remove(chave):
+                    print(f"Chave {chave} removida.")
+                else:
+                    print(f"Chave {chave} não encontrada.")
             except ValueError:
                 print("A chave deve ser um número inteiro.")
 
@@ -0,0 +1,72 @@
+import argparse
+import random
+import time
+
+from ISAM import ISAMIndex
+from ISATree import ISATree
+
+# Benchmark da árvore ISA com e sem balanceamento.
+# Para cada modo (BST simples, AVL, treap) e cada padrão de chegada das
+# chaves (ordenada, reversa, aleatória) insere n chaves e busca todas,
+# reportando o tempo médio por operação (µs) e a altura final da árvore.
+# No fim, o índice ISAM estático é construído de uma vez sobre as chaves
+# ordenadas e buscado na mesma ordem aleatória, para comparação.
+MODES = [None, "avl", "treap"]
+
+
+def run(mode, keys):
+    tree = ISATree(balance=mode, seed=0)
+
+    start = time.perf_counter()
+    for k in keys:
+        tree.insert(k, k)
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in keys:
+        tree.search(k)
+    search_time = time.perf_counter() - start
+
+    n = len(keys)
+    return insert_time / n * 1e6, search_time / n * 1e6, tree.height()
+
+
+def run_isam(ordered, lookups):
+    start = time.perf_counter()
+    index = ISAMIndex((k, k) for k in ordered)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in lookups:
+        index.search(k)
+    search_time = time.perf_counter() - start
+
+    n = len(ordered)
+    return build_time / n * 1e6, search_time / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da árvore ISA por modo de balanceamento")
+    parser.add_argument("-n", type=int, default=5_000,
+                        help="quantidade de chaves (a BST simples é O(n^2) com entrada ordenada)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    ordered = list(range(args.n))
+    shuffled = ordered[:]
+    random.Random(args.seed).shuffle(shuffled)
+    patterns = [("ordenada", ordered), ("reversa", ordered[::-1]), ("aleatória", shuffled)]
+
+    print(f"n = {args.n} chaves (tempo médio por operação, µs)")
+    print(f"{'modo':>6} {'entrada':>10} {'insert':>10} {'search':>10} {'altura':>8}")
+    for mode in MODES:
+        for name, keys in patterns:
+            ins, sea, height = run(mode, keys)
+            print(f"{mode or 'bst':>6} {name:>10} {ins:>10.2f} {sea:>10.2f} {height:>8}")
+
+    build, sea = run_isam(ordered, shuffled)
+    print(f"{'isam':>6} {'build':>10} {build:>10.2f} {sea:>10.2f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
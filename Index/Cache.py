@@ -0,0 +1,386 @@
+from collections import OrderedDict
+
+# Caches de leitura para a frente de qualquer índice (CachedIndex).
+#
+# Todas as políticas têm a mesma interface: get(chave, padrão), put(chave,
+# valor), discard(chave), clear() e len(); capacity é o número máximo de
+# entradas e evictions conta as entradas descartadas para abrir espaço
+# (discard, usado na invalidação, não conta).
+
+_MISS = object()
+
+
+class LRUCache:
+    """Descarta a entrada usada há mais tempo (OrderedDict em ordem de uso)."""
+
+    name = "lru"
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity deve ser >= 1")
+        self.capacity = capacity
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+            return data[key]
+        return default
+
+    def put(self, key, value):
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        elif len(data) >= self.capacity:
+            data.popitem(last=False)
+            self.evictions += 1
+        data[key] = value
+
+    def discard(self, key) -> bool:
+        return self._data.pop(key, _MISS) is not _MISS
+
+    def clear(self):
+        self._data.clear()
+
+
+class ClockCache:
+    """CLOCK (segunda chance): aproximação de LRU sem reordenar nada no acerto.
+
+    As entradas ficam em slots fixos com um bit de referência, ligado a
+    cada acerto. Para abrir espaço, o ponteiro percorre os slots em
+    círculo desligando os bits e descarta o primeiro slot com o bit
+    desligado.
+    """
+
+    name = "clock"
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity deve ser >= 1")
+        self.capacity = capacity
+        self.evictions = 0
+        self._slot = {}                 # chave -> slot
+        self._keys = [_MISS] * capacity
+        self._values = [None] * capacity
+        self._ref = bytearray(capacity)
+        self._free = list(range(capacity - 1, -1, -1))
+        self._hand = 0
+
+    def __len__(self):
+        return len(self._slot)
+
+    def get(self, key, default=None):
+        i = self._slot.get(key)
+        if i is None:
+            return default
+        self._ref[i] = 1
+        return self._values[i]
+
+    def put(self, key, value):
+        i = self._slot.get(key)
+        if i is None:
+            i = self._free.pop() if self._free else self._evict()
+            self._slot[key] = i
+            self._keys[i] = key
+        self._values[i] = value
+        self._ref[i] = 1
+
+    def _evict(self):
+        ref = self._ref
+        hand = self._hand
+        while ref[hand]:
+            ref[hand] = 0
+            hand = (hand + 1) % self.capacity
+        self._hand = (hand + 1) % self.capacity
+        del self._slot[self._keys[hand]]
+        self.evictions += 1
+        return hand
+
+    def discard(self, key) -> bool:
+        i = self._slot.pop(key, None)
+        if i is None:
+            return False
+        self._keys[i] = _MISS
+        self._values[i] = None
+        self._ref[i] = 0
+        self._free.append(i)
+        return True
+
+    def clear(self):
+        # evictions continua contando, como nas outras políticas
+        evictions = self.evictions
+        self.__init__(self.capacity)
+        self.evictions = evictions
+
+
+class TwoQCache:
+    """2Q: chaves vistas uma vez não expulsam as chaves quentes.
+
+    Uma chave nova entra na fila FIFO a1in (até in_ratio da capacidade);
+    ao sair dela só a chave fica lembrada em a1out (fantasma, até
+    out_ratio da capacidade). Uma chave pedida de novo enquanto está em
+    a1out foi reutilizada de verdade e vai para am, a parte LRU principal.
+    Uma varredura de chaves únicas passa só por a1in.
+    """
+
+    name = "2q"
+
+    def __init__(self, capacity: int, in_ratio: float = 0.25, out_ratio: float = 0.5):
+        if capacity < 1:
+            raise ValueError("capacity deve ser >= 1")
+        self.capacity = capacity
+        self.evictions = 0
+        self.in_limit = max(1, int(capacity * in_ratio))
+        self.out_limit = max(1, int(capacity * out_ratio))
+        self._a1in = OrderedDict()
+        self._a1out = OrderedDict()     # só chaves
+        self._am = OrderedDict()
+
+    def __len__(self):
+        return len(self._a1in) + len(self._am)
+
+    def get(self, key, default=None):
+        am = self._am
+        if key in am:
+            am.move_to_end(key)
+            return am[key]
+        # acerto em a1in não muda a posição (FIFO)
+        return self._a1in.get(key, default)
+
+    def put(self, key, value):
+        if key in self._am:
+            self._am[key] = value
+            self._am.move_to_end(key)
+            return
+        if key in self._a1in:
+            self._a1in[key] = value
+            return
+        if len(self) >= self.capacity:
+            self._reclaim()
+        if self._a1out.pop(key, _MISS) is not _MISS:
+            self._am[key] = value
+        else:
+            self._a1in[key] = value
+
+    def _reclaim(self):
+        if len(self._a1in) > self.in_limit or not self._am:
+            old, _ = self._a1in.popitem(last=False)
+            self._a1out[old] = None
+            if len(self._a1out) > self.out_limit:
+                self._a1out.popitem(last=False)
+        else:
+            self._am.popitem(last=False)
+        self.evictions += 1
+
+    def discard(self, key) -> bool:
+        self._a1out.pop(key, None)
+        return (self._am.pop(key, _MISS) is not _MISS) or (self._a1in.pop(key, _MISS) is not _MISS)
+
+    def clear(self):
+        self._a1in.clear()
+        self._a1out.clear()
+        self._am.clear()
+
+
+class ARCCache:
+    """ARC (Adaptive Replacement Cache, Megiddo e Modha).
+
+    t1 guarda as chaves vistas uma vez e t2 as vistas mais de uma vez,
+    ambas em ordem LRU; b1 e b2 lembram só as chaves descartadas de cada
+    uma. Um acerto num fantasma de b1 aumenta p (espaço alvo de t1), um
+    em b2 o diminui: a divisão entre recência e frequência se ajusta à
+    carga.
+    """
+
+    name = "arc"
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity deve ser >= 1")
+        self.capacity = capacity
+        self.evictions = 0
+        self.p = 0.0
+        self._t1 = OrderedDict()
+        self._t2 = OrderedDict()
+        self._b1 = OrderedDict()        # só chaves
+        self._b2 = OrderedDict()
+
+    def __len__(self):
+        return len(self._t1) + len(self._t2)
+
+    def get(self, key, default=None):
+        t1, t2 = self._t1, self._t2
+        if key in t2:
+            t2.move_to_end(key)
+            return t2[key]
+        if key in t1:
+            value = t2[key] = t1.pop(key)
+            return value
+        return default
+
+    def put(self, key, value):
+        t1, t2, b1, b2 = self._t1, self._t2, self._b1, self._b2
+        c = self.capacity
+        if key in t2:
+            t2[key] = value
+            t2.move_to_end(key)
+            return
+        if key in t1:
+            del t1[key]
+            t2[key] = value
+            return
+        if key in b1:
+            self.p = min(c, self.p + max(len(b2) / len(b1), 1))
+            del b1[key]
+            self._replace(in_b2=False)
+            t2[key] = value
+            return
+        if key in b2:
+            self.p = max(0.0, self.p - max(len(b1) / len(b2), 1))
+            del b2[key]
+            self._replace(in_b2=True)
+            t2[key] = value
+            return
+
+        if len(t1) + len(b1) >= c:
+            if len(t1) < c:
+                b1.popitem(last=False)
+                self._replace(in_b2=False)
+            else:
+                t1.popitem(last=False)
+                self.evictions += 1
+        elif len(t1) + len(t2) + len(b1) + len(b2) >= c:
+            if len(t1) + len(t2) + len(b1) + len(b2) >= 2 * c:
+                b2.popitem(last=False)
+            self._replace(in_b2=False)
+        t1[key] = value
+
+    def _replace(self, in_b2):
+        # só descarta com a cache cheia (a invalidação pode ter aberto espaço)
+        t1, t2 = self._t1, self._t2
+        if len(t1) + len(t2) < self.capacity:
+            return
+        if t1 and (len(t1) > self.p or (in_b2 and len(t1) == self.p) or not t2):
+            old, _ = t1.popitem(last=False)
+            self._b1[old] = None
+        else:
+            old, _ = t2.popitem(last=False)
+            self._b2[old] = None
+        self.evictions += 1
+
+    def discard(self, key) -> bool:
+        return (self._t1.pop(key, _MISS) is not _MISS) or (self._t2.pop(key, _MISS) is not _MISS)
+
+    def clear(self):
+        self.p = 0.0
+        for part in (self._t1, self._t2, self._b1, self._b2):
+            part.clear()
+
+
+POLICIES = {cls.name: cls for cls in (LRUCache, ClockCache, TwoQCache, ARCCache)}
+
+
+def make_cache(policy: str, capacity: int):
+    """Cria uma cache vazia pelo nome da política (lru, clock, 2q ou arc)."""
+    try:
+        cls = POLICIES[policy]
+    except KeyError:
+        raise ValueError(f"política de cache desconhecida: {policy!r} (use {tuple(POLICIES)})") from None
+    return cls(capacity)
+
+
+class CachedIndex:
+    """Cache de leitura na frente de um índice (qualquer Index).
+
+    search consulta a cache e, na falta, o índice, guardando o resultado
+    (inclusive None de chave ausente). insert, insert_many e remove passam
+    para o índice e invalidam as chaves na cache, então uma busca nunca
+    vê um valor antigo. range e items vão direto ao índice. Escritas feitas
+    na estrutura sem passar por aqui não invalidam a cache.
+    """
+
+    def __init__(self, index, cache):
+        self.index = index
+        self.cache = cache
+        self._cached = cache.get
+        self.kind = index.kind
+        self.ordered = index.ordered
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def search(self, key):
+        value = self._cached(key, _MISS)
+        if value is not _MISS:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self.index.search(key)
+        self.cache.put(key, value)
+        return value
+
+    def search_many(self, keys):
+        get = self.cache.get
+        results = [get(key, _MISS) for key in keys]
+        missing = [i for i, value in enumerate(results) if value is _MISS]
+        self.hits += len(results) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            keys = list(keys)
+            found = self.index.search_many([keys[i] for i in missing])
+            put = self.cache.put
+            for i, value in zip(missing, found):
+                results[i] = value
+                put(keys[i], value)
+        return results
+
+    def _invalidate(self, key):
+        if self.cache.discard(key):
+            self.invalidations += 1
+
+    def insert(self, key, value):
+        self.index.insert(key, value)
+        self._invalidate(key)
+
+    def insert_many(self, pairs):
+        pairs = list(pairs)
+        self.index.insert_many(pairs)
+        for key, _ in pairs:
+            self._invalidate(key)
+
+    def remove(self, key) -> bool:
+        removed = self.index.remove(key)
+        self._invalidate(key)
+        return removed
+
+    def range(self, lo, hi):
+        return self.index.range(lo, hi)
+
+    def items(self):
+        return self.index.items()
+
+    def enable_instrumentation(self, timers: bool = True):
+        self.index.enable_instrumentation(timers)
+
+    def cache_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.cache.name,
+            "capacity": self.cache.capacity,
+            "size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.cache.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def stats(self) -> dict:
+        stats = self.index.stats()
+        stats["cache"] = self.cache_stats()
+        return stats
@@ -0,0 +1,157 @@
+import os
+import sys
+from typing import Iterator, Protocol
+
+# As estruturas ficam em diretórios irmãos (cada uma é um script
+# independente); este módulo os coloca no sys.path para importá-las.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _name in ("BPlusTree", "ExtensibleHash", "ISA"):
+    _path = os.path.join(_ROOT, _name)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from BPlusTree import BPlusTree  # noqa: E402
+from Cache import CachedIndex, make_cache  # noqa: E402
+from ExtensibleHash import ExtensibleHash  # noqa: E402
+from ISATree import ISATree  # noqa: E402
+from Metrics import OpTimers  # noqa: E402
+
+
+class Index(Protocol):
+    """Interface comum dos índices.
+
+    - insert(chave, valor): insere ou atualiza;
+    - search(chave): valor mais recente da chave, ou None;
+    - remove(chave): True se a chave existia;
+    - range(lo, hi): pares com lo <= chave <= hi em ordem de chave;
+    - search_many / insert_many: versões em lote;
+    - stats(): dicionário com as estatísticas estruturais (e os contadores
+      e cronômetros, se ligados por enable_instrumentation).
+    """
+
+    kind: str
+    ordered: bool
+
+    def insert(self, key, value) -> None: ...
+
+    def search(self, key): ...
+
+    def remove(self, key) -> bool: ...
+
+    def range(self, lo, hi) -> Iterator: ...
+
+    def items(self) -> Iterator: ...
+
+    def search_many(self, keys) -> list: ...
+
+    def insert_many(self, pairs) -> None: ...
+
+    def stats(self) -> dict: ...
+
+
+class IndexAdapter:
+    """Base dos adaptadores: repassa as operações para a estrutura."""
+
+    kind = None
+    ordered = True  # range() sai da própria estrutura, sem ordenar
+    TIMED = ("search", "insert", "remove", "search_many", "insert_many")
+
+    def __init__(self, structure):
+        self.structure = structure
+        self.timers = None
+
+    def enable_instrumentation(self, timers: bool = True):
+        """Liga os contadores da estrutura e, com timers, cronometra as operações de TIMED."""
+        self.structure.enable_counters()
+        if timers and self.timers is None:
+            self.timers = OpTimers()
+            for name in self.TIMED:
+                setattr(self, name, self.timers.wrap(name, getattr(self, name)))
+
+    def insert(self, key, value):
+        self.structure.insert(key, value)
+
+    def search(self, key):
+        return self.structure.search(key)
+
+    def remove(self, key) -> bool:
+        return bool(self.structure.remove(key))
+
+    def range(self, lo, hi):
+        return self.structure.range(lo, hi)
+
+    def items(self):
+        return self.structure.items()
+
+    def search_many(self, keys):
+        return self.structure.search_many(keys)
+
+    def insert_many(self, pairs):
+        self.structure.insert_many(pairs)
+
+    def stats(self) -> dict:
+        stats = self.structure.stats()
+        if self.timers is not None:
+            stats["timers"] = self.timers.snapshot()
+        return stats
+
+
+class BPlusTreeIndex(IndexAdapter):
+    """BPlusTree guarda uma lista de valores por chave; aqui vale o último inserido."""
+
+    kind = "bplustree"
+
+    def search(self, key):
+        values = self.structure.search(key)
+        return values[-1] if values else None
+
+    def search_many(self, keys):
+        return [values[-1] if values else None for values in self.structure.search_many(keys)]
+
+    def range(self, lo, hi):
+        return ((key, values[-1]) for key, values in self.structure.range(lo, hi))
+
+    def items(self):
+        return ((key, values[-1]) for key, values in self.structure.items())
+
+
+class HashIndex(IndexAdapter):
+    """ExtensibleHash não tem ordem: range() varre tudo e ordena o resultado."""
+
+    kind = "hash"
+    ordered = False
+
+    def range(self, lo, hi):
+        return iter(sorted((key, value) for key, value in self.structure.items()
+                           if (lo is None or lo <= key) and (hi is None or key <= hi)))
+
+
+class ISATreeIndex(IndexAdapter):
+    kind = "isa"
+
+
+STRUCTURES = ("bplustree", "hash", "isa")
+
+
+def make_index(kind: str, order: int = 64, compact: bool = False, bucket_size: int = 64,
+               balance="avl", seed=None, cache=None, cache_size: int = 10_000,
+               instrument: bool = False):
+    """Cria um índice vazio pelo nome (bplustree, hash ou isa).
+
+    cache (lru, clock, 2q ou arc) coloca na frente do índice uma cache de
+    leitura (CachedIndex) com até cache_size chaves. instrument liga os
+    contadores e cronômetros (enable_instrumentation).
+    """
+    if kind == "bplustree":
+        index = BPlusTreeIndex(BPlusTree(order, compact=compact))
+    elif kind == "hash":
+        index = HashIndex(ExtensibleHash(bucket_size))
+    elif kind == "isa":
+        index = ISATreeIndex(ISATree(balance=balance, seed=seed))
+    else:
+        raise ValueError(f"estrutura desconhecida: {kind!r} (use {STRUCTURES})")
+    if instrument:
+        index.enable_instrumentation()
+    if cache is not None:
+        return CachedIndex(index, make_cache(cache, cache_size))
+    return index
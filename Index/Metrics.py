@@ -0,0 +1,131 @@
+import json
+import re
+import time
+
+# Exportação das estatísticas dos índices (dicionários de stats()) em JSON
+# ou no formato de texto do Prometheus, e cronômetros por operação.
+
+
+class OpTimers:
+    """Tempo por operação: chamadas, tempo total e maior tempo (ns).
+
+    wrap(nome, função) devolve a função cronometrada; o adaptador troca
+    os próprios métodos por ela só quando os cronômetros são ligados, então
+    desligados eles não custam nada.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.total_ns = {}
+        self.max_ns = {}
+
+    def wrap(self, name, func):
+        calls, total_ns, max_ns = self.calls, self.total_ns, self.max_ns
+        calls[name] = total_ns[name] = max_ns[name] = 0
+        clock = time.perf_counter_ns
+
+        def timed(*args):
+            t0 = clock()
+            try:
+                return func(*args)
+            finally:
+                elapsed = clock() - t0
+                calls[name] += 1
+                total_ns[name] += elapsed
+                if elapsed > max_ns[name]:
+                    max_ns[name] = elapsed
+        return timed
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "calls": calls,
+                "total_seconds": self.total_ns[name] / 1e9,
+                "mean_us": self.total_ns[name] / calls / 1e3 if calls else 0.0,
+                "max_us": self.max_ns[name] / 1e3,
+            }
+            for name, calls in self.calls.items()
+        }
+
+
+def to_json(stats: dict, indent=None) -> str:
+    return json.dumps(stats, indent=indent, sort_keys=True, default=str)
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def to_prometheus(stats: dict, prefix: str = "csgbd_index", labels: dict = None) -> str:
+    """Estatísticas de um índice no formato de texto do Prometheus.
+
+    Números viram gauges (bool vira 0/1); um dicionário de números (como
+    um histograma) vira uma série com o rótulo key; "counters" viram
+    counters (sufixo _total) e "timers" um summary em segundos por
+    operação (rótulo op). Textos (modo, balanceamento, política) vão
+    como rótulos da métrica <prefixo>_info.
+    """
+    return to_prometheus_many([(labels, stats)], prefix)
+
+
+def to_prometheus_many(labelled_stats, prefix: str = "csgbd_index") -> str:
+    """Vários índices num só texto Prometheus: pares (rótulos, stats()).
+
+    As amostras são agrupadas por métrica, então cada # TYPE aparece uma
+    vez só, seguido das amostras de todos os índices (o formato não aceita
+    a mesma métrica declarada duas vezes).
+    """
+    families = {}
+
+    def emit(name, kind, labels, samples):
+        _, family = families.setdefault(name, (kind, []))
+        for sample_labels, value, suffix in samples:
+            text = str(value) if isinstance(value, int) else repr(float(value))
+            family.append(f"{name}{suffix}{_labels({**labels, **sample_labels})} {text}")
+
+    def walk(prefix, stats, labels, info):
+        for key, value in stats.items():
+            name = _metric_name(f"{prefix}_{key}")
+            if key == "counters" and isinstance(value, dict):
+                for counter, count in sorted(value.items()):
+                    emit(_metric_name(f"{prefix}_{counter}_total"), "counter", labels, [({}, count, "")])
+            elif key == "timers" and isinstance(value, dict):
+                samples = []
+                for op, timer in value.items():
+                    samples.append(({"op": op}, timer["total_seconds"], "_sum"))
+                    samples.append(({"op": op}, timer["calls"], "_count"))
+                emit(_metric_name(f"{prefix}_op_seconds"), "summary", labels, samples)
+            elif isinstance(value, bool):
+                emit(name, "gauge", labels, [({}, int(value), "")])
+            elif _is_number(value):
+                emit(name, "gauge", labels, [({}, value, "")])
+            elif isinstance(value, dict) and value and all(_is_number(v) for v in value.values()):
+                emit(name, "gauge", labels, [({"key": k}, v, "") for k, v in value.items()])
+            elif isinstance(value, dict):
+                walk(name, value, labels, info)
+            elif isinstance(value, str):
+                info[_metric_name(key)] = value
+
+    for labels, stats in labelled_stats:
+        labels = dict(labels or {})
+        info = {}
+        walk(prefix, stats, labels, info)
+        if info:
+            emit(f"{prefix}_info", "gauge", labels, [(info, 1, "")])
+
+    lines = []
+    for name, (kind, family) in families.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(family)
+    return "\n".join(lines) + "\n" if lines else ""
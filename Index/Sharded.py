@@ -0,0 +1,415 @@
+import argparse
+import heapq
+import multiprocessing
+import os
+import pickle
+import random
+import time
+from array import array
+from bisect import bisect_right
+from multiprocessing import shared_memory
+from operator import itemgetter
+
+from Index import make_index
+from ExtensibleHash import default_hash
+
+# Índice particionado entre processos: cada shard é um processo com a sua
+# própria estrutura (criada por make_index, sem nada de especial), então o
+# trabalho das estruturas roda em paralelo, fora do GIL do processo
+# principal.
+#
+# O processo principal só reparte as chaves e junta os resultados. Os lotes
+# (insert_many, search_many, range) passam por dois buffers de memória
+# compartilhada por shard, um de pedido e um de resposta; pelo Pipe vai só
+# a descrição (operação, formato e tamanho de cada parte). Chaves e valores
+# inteiros vão crus (array 'q'), o resto em pickle; uma parte que não cabe
+# no buffer vai pelo próprio Pipe. As operações avulsas (insert, search,
+# remove) vão direto pelo Pipe: cada uma é uma ida e volta entre processos,
+# então a vazão vem dos lotes.
+
+PARTITIONS = ("hash", "range")
+
+# os bits baixos do hash escolhem o bucket dentro do shard (diretório de
+# até 2^24 entradas); o shard sai dos bits acima deles
+_SHARD_SHIFT = 24
+
+
+def _encode(items):
+    """Parte de um lote: (formato, buffer). Inteiros de 64 bits vão como array, o resto em pickle."""
+    try:
+        return "q", array("q", items)
+    except (TypeError, OverflowError):
+        return "p", pickle.dumps(items, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(fmt, data):
+    if fmt == "q":
+        values = array("q")
+        values.frombytes(data)
+        return values.tolist()
+    return pickle.loads(data)
+
+
+def _pack(buf, parts):
+    """Escreve as partes no buffer compartilhado; devolve a descrição que vai pelo Pipe.
+
+    Se as partes não cabem no buffer, vão inteiras na própria descrição.
+    """
+    views = [(fmt, memoryview(data).cast("B")) for fmt, data in parts]
+    if sum(view.nbytes for _, view in views) > buf.nbytes:
+        return "pipe", [(fmt, bytes(view)) for fmt, view in views]
+    offset = 0
+    layout = []
+    for fmt, view in views:
+        buf[offset:offset + view.nbytes] = view
+        offset += view.nbytes
+        layout.append((fmt, view.nbytes))
+    return "shm", layout
+
+
+def _unpack(buf, packed):
+    where, layout = packed
+    if where == "pipe":
+        return [_decode(fmt, data) for fmt, data in layout]
+    parts = []
+    offset = 0
+    for fmt, nbytes in layout:
+        with buf[offset:offset + nbytes] as view:
+            parts.append(_decode(fmt, view))
+        offset += nbytes
+    return parts
+
+
+def _range_items(index, lo, hi):
+    """Pares do shard entre lo e hi (None = sem limite), em ordem de chave."""
+    if not index.ordered:
+        return sorted((key, value) for key, value in index.items()
+                      if (lo is None or lo <= key) and (hi is None or key <= hi))
+    if lo is None and hi is None:
+        return list(index.items())
+    return list(index.range(lo, hi))
+
+
+def _serve(conn, kind, options, request, response):
+    """Laço do processo de um shard: executa os comandos recebidos pelo Pipe."""
+    index = make_index(kind, **options)
+    inbox, outbox = request.buf, response.buf
+    try:
+        while True:
+            op, args = conn.recv()
+            if op == "close":
+                conn.send(("ok", None))
+                return
+            try:
+                if op == "insert_many":
+                    keys, values = _unpack(inbox, args)
+                    index.insert_many(zip(keys, values))
+                    result = None
+                elif op == "search_many":
+                    keys, = _unpack(inbox, args)
+                    result = _pack(outbox, [_encode(index.search_many(keys))])
+                elif op == "range":
+                    pairs = _range_items(index, *args)
+                    result = _pack(outbox, [_encode([key for key, _ in pairs]),
+                                            _encode([value for _, value in pairs])])
+                elif op == "insert":
+                    result = index.insert(*args)
+                elif op == "search":
+                    result = index.search(*args)
+                elif op == "remove":
+                    result = index.remove(*args)
+                elif op == "enable_instrumentation":
+                    result = index.enable_instrumentation(*args)
+                elif op == "stats":
+                    result = index.stats()
+                else:
+                    raise ValueError(f"comando desconhecido: {op!r}")
+            except Exception as exc:
+                conn.send(("error", exc))
+            else:
+                conn.send(("ok", result))
+    finally:
+        # os buffers são do processo principal, que os remove no close()
+        del inbox, outbox
+        request.close()
+        response.close()
+
+
+class _Shard:
+    """Lado do processo principal de um shard: processo, Pipe e os dois buffers."""
+
+    def __init__(self, ctx, kind, options, buffer_size):
+        self.request = shared_memory.SharedMemory(create=True, size=buffer_size)
+        self.response = shared_memory.SharedMemory(create=True, size=buffer_size)
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child, kind, options, self.request, self.response),
+                                   daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, op, args=None):
+        self.conn.send((op, args))
+
+    def send_batch(self, op, parts):
+        self.conn.send((op, _pack(self.request.buf, parts)))
+
+    def receive(self):
+        status, result = self.conn.recv()
+        if status == "error":
+            raise result
+        return result
+
+    def call(self, op, *args):
+        self.send(op, args)
+        return self.receive()
+
+    def close(self):
+        try:
+            if self.process.is_alive():
+                self.call("close")
+        except (EOFError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        for shm in (self.request, self.response):
+            shm.close()
+            shm.unlink()
+
+
+def split_points(sample, shards: int) -> list:
+    """Limites de uma partição por intervalo: quantis de uma amostra das chaves."""
+    keys = sorted(set(sample))
+    if not keys:
+        raise ValueError("a amostra de chaves está vazia")
+    points = []
+    for i in range(1, shards):
+        key = keys[len(keys) * i // shards]
+        if not points or key > points[-1]:
+            points.append(key)
+    return points
+
+
+class ShardedIndex:
+    """Índice repartido entre processos (um shard por núcleo, por padrão).
+
+    partition="hash" escolhe o shard pelo hash da chave (padrão do hash
+    extensível); partition="range" pelos limites em bounds (a chave vai
+    para o primeiro shard cujo limite é maior que ela), ou pelos quantis de
+    sample, se bounds não vier (padrão das árvores). Com partição por
+    intervalo, range() consulta só os shards que cobrem [lo, hi]; com
+    partição por hash, todos. Nos dois casos os pares dos shards são
+    intercalados em ordem de chave.
+
+    Os lotes de cada chamada vão a todos os shards envolvidos antes de
+    esperar a primeira resposta, então os shards trabalham ao mesmo tempo;
+    lotes maiores que batch_size são divididos. As demais opções (order,
+    bucket_size, cache, instrument, ...) vão para o make_index de cada
+    shard.
+    """
+
+    def __init__(self, kind: str = "bplustree", shards: int = None, partition: str = None,
+                 bounds=None, sample=None, buffer_size: int = 4 << 20, batch_size: int = 65_536,
+                 start_method: str = None, **options):
+        if partition is None:
+            partition = "hash" if kind == "hash" else "range"
+        if partition not in PARTITIONS:
+            raise ValueError(f"partição desconhecida: {partition!r} (use {PARTITIONS})")
+        if shards is None:
+            shards = len(bounds) + 1 if bounds is not None else os.cpu_count() or 1
+        if shards < 1:
+            raise ValueError("shards deve ser >= 1")
+        if partition == "range":
+            if bounds is None and sample is not None:
+                bounds = split_points(sample, shards)
+            elif bounds is None and shards > 1:
+                raise ValueError("partição por intervalo precisa de bounds ou sample")
+            bounds = list(bounds or ())
+            if any(a >= b for a, b in zip(bounds, bounds[1:])):
+                raise ValueError("bounds deve ser estritamente crescente")
+            shards = len(bounds) + 1
+        make_index(kind, **options)  # valida kind e as opções antes de subir os processos
+
+        self.kind = kind
+        self.ordered = kind != "hash"
+        self.partition = partition
+        self.bounds = bounds
+        self.batch_size = batch_size
+        ctx = multiprocessing.get_context(start_method)
+        self._shards = []
+        try:
+            for _ in range(shards):
+                self._shards.append(_Shard(ctx, kind, options, buffer_size))
+        except BaseException:
+            self.close()
+            raise
+        if partition == "hash":
+            n = shards
+            self.shard_of = lambda key: (default_hash(key) >> _SHARD_SHIFT) % n
+        else:
+            self.shard_of = lambda key, bounds=bounds: bisect_right(bounds, key)
+
+    @property
+    def shards(self) -> int:
+        return len(self._shards)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Encerra os processos e libera os buffers compartilhados."""
+        shards, self._shards = self._shards, []
+        for shard in shards:
+            shard.close()
+
+    @staticmethod
+    def _gather(shards, batch=False):
+        """Respostas de cada shard, na ordem; um erro só é levantado depois de ler todas."""
+        results = []
+        error = None
+        for shard in shards:
+            try:
+                result = shard.receive()
+                results.append(_unpack(shard.response.buf, result) if batch else result)
+            except Exception as exc:
+                error = error or exc
+        if error is not None:
+            raise error
+        return results
+
+    def _split(self, keys):
+        """Posições das chaves de cada shard: {shard: [posição, ...]}."""
+        shard_of = self.shard_of
+        groups = {}
+        for i, key in enumerate(keys):
+            s = shard_of(key)
+            if s in groups:
+                groups[s].append(i)
+            else:
+                groups[s] = [i]
+        return groups
+
+    def _batches(self, items):
+        items = list(items)
+        size = self.batch_size
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+
+    def insert(self, key, value):
+        self._shards[self.shard_of(key)].call("insert", key, value)
+
+    def search(self, key):
+        return self._shards[self.shard_of(key)].call("search", key)
+
+    def remove(self, key) -> bool:
+        return self._shards[self.shard_of(key)].call("remove", key)
+
+    def insert_many(self, pairs):
+        for batch in self._batches(pairs):
+            groups = self._split([key for key, _ in batch])
+            for s, positions in groups.items():
+                self._shards[s].send_batch("insert_many", [_encode([batch[i][0] for i in positions]),
+                                                           _encode([batch[i][1] for i in positions])])
+            self._gather([self._shards[s] for s in groups])
+
+    def search_many(self, keys):
+        results = []
+        for batch in self._batches(keys):
+            groups = self._split(batch)
+            for s, positions in groups.items():
+                self._shards[s].send_batch("search_many", [_encode([batch[i] for i in positions])])
+            found = [None] * len(batch)
+            replies = self._gather([self._shards[s] for s in groups], batch=True)
+            for positions, (values,) in zip(groups.values(), replies):
+                for i, value in zip(positions, values):
+                    found[i] = value
+            results.extend(found)
+        return results
+
+    def _scan(self, lo, hi):
+        if self.partition == "range":
+            first = 0 if lo is None else bisect_right(self.bounds, lo)
+            last = len(self.bounds) if hi is None else bisect_right(self.bounds, hi)
+            shards = self._shards[first:last + 1]
+        else:
+            shards = self._shards
+        for shard in shards:
+            shard.send("range", (lo, hi))
+        runs = [zip(keys, values) for keys, values in self._gather(shards, batch=True)]
+        if self.partition == "range":
+            # shards disjuntos e em ordem de limite: basta concatená-los
+            return (pair for run in runs for pair in run)
+        return heapq.merge(*runs, key=itemgetter(0))
+
+    def range(self, lo, hi):
+        return self._scan(lo, hi)
+
+    def items(self):
+        return self._scan(None, None)
+
+    def enable_instrumentation(self, timers: bool = True):
+        for shard in self._shards:
+            shard.send("enable_instrumentation", (timers,))
+        self._gather(self._shards)
+
+    def stats(self) -> dict:
+        """Estatísticas de cada shard (per_shard) e a distribuição das chaves entre eles."""
+        for shard in self._shards:
+            shard.send("stats")
+        per_shard = self._gather(self._shards)
+        keys = [s.get("keys", s.get("items", 0)) for s in per_shard]
+        total = sum(keys)
+        return {
+            "kind": self.kind,
+            "partition": self.partition,
+            "shards": len(per_shard),
+            "keys": total,
+            "keys_per_shard": {str(i): n for i, n in enumerate(keys)},
+            "imbalance": max(keys) * len(keys) / total if total else 1.0,
+            "per_shard": per_shard,
+        }
+
+
+def _measure(index, pairs, keys):
+    start = time.perf_counter()
+    index.insert_many(pairs)
+    insert_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index.search_many(keys)
+    search_time = time.perf_counter() - start
+    return len(pairs) / insert_time, len(keys) / search_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de insert_many/search_many por número de shards")
+    parser.add_argument("-n", type=int, default=500_000, help="quantidade de chaves")
+    parser.add_argument("--structures", default="bplustree,hash", help="estruturas separadas por vírgula")
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    keys = rng.sample(range(args.n * 10), args.n)
+    pairs = [(key, key) for key in keys]
+    lookups = keys[:]
+    rng.shuffle(lookups)
+    counts = sorted({1, *(2 ** i for i in range(1, args.max_shards.bit_length())), args.max_shards})
+
+    print(f"n = {args.n} chaves, {os.cpu_count()} núcleos (milhares de chaves/s)")
+    print(f"{'estrutura':>10} {'shards':>7} {'insert':>10} {'search':>10}")
+    for kind in args.structures.split(","):
+        ins, sea = _measure(make_index(kind), pairs, lookups)
+        print(f"{kind:>10} {'-':>7} {ins / 1e3:>10.0f} {sea / 1e3:>10.0f}")
+        for shards in counts:
+            with ShardedIndex(kind, shards=shards, sample=rng.sample(keys, min(len(keys), 10_000))) as index:
+                ins, sea = _measure(index, pairs, lookups)
+            print(f"{kind:>10} {shards:>7} {ins / 1e3:>10.0f} {sea / 1e3:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+import argparse
+import random
+import tracemalloc
+from collections import namedtuple
+
+from Index import make_index
+
+# Um RID (identificador de registro) é o inteiro página * page_slots + slot.
+
+
+class _Page:
+    __slots__ = ("records", "free")
+
+    def __init__(self, page_slots: int):
+        self.records = [None] * page_slots
+        self.free = list(range(page_slots - 1, -1, -1))  # pop() devolve o menor slot livre
+
+
+class RecordHeap:
+    """Heap de registros em páginas de slots com RIDs estáveis.
+
+    Cada registro ocupa um slot de uma página e o RID não muda enquanto o
+    registro existir (update troca o conteúdo do slot no lugar). O slot de
+    um registro removido volta para a lista de livres da página e pode ser
+    reaproveitado por uma inserção futura. Inserções usam primeiro as
+    páginas com slots livres; uma página nova só é criada quando não há
+    nenhuma.
+    """
+
+    def __init__(self, page_slots: int = 256):
+        if page_slots < 1:
+            raise ValueError("page_slots deve ser >= 1")
+        self.page_slots = page_slots
+        self.pages = []
+        self._free_pages = []  # páginas com pelo menos um slot livre
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, rid):
+        try:
+            self._locate(rid)
+        except KeyError:
+            return False
+        return True
+
+    def _locate(self, rid):
+        page_no, slot = divmod(rid, self.page_slots)
+        if rid < 0 or page_no >= len(self.pages) or self.pages[page_no].records[slot] is None:
+            raise KeyError(f"RID inexistente: {rid}")
+        return self.pages[page_no], slot
+
+    def insert(self, record) -> int:
+        """Guarda o registro e devolve o RID dele."""
+        if record is None:
+            raise ValueError("registro não pode ser None")
+        if self._free_pages:
+            page_no = self._free_pages[-1]
+            page = self.pages[page_no]
+        else:
+            page_no = len(self.pages)
+            page = _Page(self.page_slots)
+            self.pages.append(page)
+            self._free_pages.append(page_no)
+        slot = page.free.pop()
+        if not page.free:
+            self._free_pages.pop()
+        page.records[slot] = record
+        self._count += 1
+        return page_no * self.page_slots + slot
+
+    def get(self, rid: int):
+        page, slot = self._locate(rid)
+        return page.records[slot]
+
+    def update(self, rid: int, record):
+        if record is None:
+            raise ValueError("registro não pode ser None")
+        page, slot = self._locate(rid)
+        page.records[slot] = record
+
+    def delete(self, rid: int):
+        """Remove o registro e devolve o conteúdo que estava no slot."""
+        page, slot = self._locate(rid)
+        record = page.records[slot]
+        page.records[slot] = None
+        page.free.append(slot)
+        if len(page.free) == 1:
+            self._free_pages.append(rid // self.page_slots)
+        self._count -= 1
+        return record
+
+    def scan(self):
+        """Pares (RID, registro) em ordem de RID."""
+        page_slots = self.page_slots
+        for page_no, page in enumerate(self.pages):
+            base = page_no * page_slots
+            for slot, record in enumerate(page.records):
+                if record is not None:
+                    yield base + slot, record
+
+    def stats(self) -> dict:
+        slots = len(self.pages) * self.page_slots
+        return {
+            "pages": len(self.pages),
+            "page_slots": self.page_slots,
+            "records": self._count,
+            "fill": self._count / slots if slots else 0.0,
+        }
+
+
+def record_key(record, attr):
+    """Chave de um registro (dict) para o atributo, ou tupla para vários.
+
+    None quando o atributo falta: o registro fica fora do índice.
+    """
+    if isinstance(attr, tuple):
+        key = tuple(record.get(a) for a in attr)
+        return None if None in key else key
+    return record.get(attr)
+
+
+class TableIndex:
+    """Índice de um atributo: chave -> RID (unique) ou lista de RIDs.
+
+    A estrutura é qualquer índice de make_index; ela guarda só RIDs, os
+    registros ficam no heap. As listas de RIDs são alteradas no lugar,
+    então cada chave é inserida na estrutura uma vez só.
+    """
+
+    def __init__(self, name: str, attr, index, unique: bool = False):
+        self.name = name
+        self.attr = attr
+        self.index = index
+        self.unique = unique
+
+    @property
+    def kind(self) -> str:
+        return self.index.kind
+
+    def rids(self, key) -> list:
+        """RIDs com a chave (lista vazia se não houver)."""
+        stored = self.index.search(key)
+        if stored is None:
+            return []
+        return [stored] if self.unique else list(stored)
+
+    def conflicts(self, key, rid=None) -> bool:
+        """True se a chave já pertence a outro registro num índice unique."""
+        if not self.unique or key is None:
+            return False
+        stored = self.index.search(key)
+        return stored is not None and stored != rid
+
+    def add(self, key, rid):
+        if key is None:
+            return
+        if self.unique:
+            if self.conflicts(key, rid):
+                raise ValueError(f"chave duplicada no índice {self.name}: {key!r}")
+            self.index.insert(key, rid)
+            return
+        stored = self.index.search(key)
+        if stored is None:
+            self.index.insert(key, [rid])
+        else:
+            stored.append(rid)
+
+    def discard(self, key, rid):
+        if key is None:
+            return
+        if self.unique:
+            self.index.remove(key)
+            return
+        stored = self.index.search(key)
+        if stored is None:
+            return
+        stored.remove(rid)
+        if not stored:
+            self.index.remove(key)
+
+    def range(self, lo, hi):
+        """Pares (chave, RID) com lo <= chave <= hi em ordem de chave."""
+        for key, stored in self.index.range(lo, hi):
+            if self.unique:
+                yield key, stored
+            else:
+                for rid in stored:
+                    yield key, rid
+
+
+# access: "eq" (busca de uma chave no índice), "range" (varredura ordenada
+# do índice) ou "scan" (varredura do heap com filtro); index: nome do
+# índice usado (None no scan).
+Plan = namedtuple("Plan", ["access", "index", "attr", "lo", "hi"])
+
+# preferência por estrutura: hash para igualdade, árvore B+ para intervalos
+# (o hash não tem ordem: um intervalo nele seria uma varredura completa)
+_EQ_PREFERENCE = {"hash": 0, "bplustree": 1, "isa": 2}
+_RANGE_PREFERENCE = {"bplustree": 0, "isa": 1}
+
+
+class Table:
+    """Registros (dicts) num RecordHeap com índices mantidos automaticamente.
+
+    Cada índice (primário ou secundário) usa qualquer das três estruturas
+    e guarda só RIDs. insert, update e delete atualizam todos os índices;
+    as restrições unique são conferidas antes de qualquer alteração, então
+    uma operação recusada não deixa nada pela metade.
+    """
+
+    def __init__(self, page_slots: int = 256):
+        self.heap = RecordHeap(page_slots)
+        self.indexes = {}
+        self.primary = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def create_index(self, name: str, attr, kind: str = "bplustree", unique: bool = False,
+                     primary: bool = False, **options) -> TableIndex:
+        """Cria um índice sobre attr (nome ou tupla de nomes) e o preenche com os registros atuais.
+
+        primary=True implica unique; a tabela tem no máximo um índice primário.
+        options vão para make_index (order, bucket_size, balance, ...).
+        """
+        if name in self.indexes:
+            raise ValueError(f"índice já existe: {name}")
+        if primary and self.primary is not None:
+            raise ValueError(f"a tabela já tem índice primário: {self.primary.name}")
+        entry = TableIndex(name, attr, make_index(kind, **options), unique or primary)
+        for rid, record in self.heap.scan():
+            entry.add(record_key(record, attr), rid)
+        self.indexes[name] = entry
+        if primary:
+            self.primary = entry
+        return entry
+
+    def drop_index(self, name: str) -> bool:
+        entry = self.indexes.pop(name, None)
+        if entry is not None and entry is self.primary:
+            self.primary = None
+        return entry is not None
+
+    def _check_unique(self, record, rid=None):
+        for entry in self.indexes.values():
+            key = record_key(record, entry.attr)
+            if entry.conflicts(key, rid):
+                raise ValueError(f"chave duplicada no índice {entry.name}: {key!r}")
+
+    def insert(self, record: dict) -> int:
+        """Insere o registro e devolve o RID."""
+        self._check_unique(record)
+        rid = self.heap.insert(record)
+        for entry in self.indexes.values():
+            entry.add(record_key(record, entry.attr), rid)
+        return rid
+
+    def get(self, rid: int) -> dict:
+        return self.heap.get(rid)
+
+    def lookup(self, key):
+        """Registro com a chave primária, ou None."""
+        if self.primary is None:
+            raise ValueError("a tabela não tem índice primário")
+        rid = self.primary.index.search(key)
+        return None if rid is None else self.heap.get(rid)
+
+    def update(self, rid: int, record: dict):
+        """Troca o registro do RID (que não muda), ajustando os índices cujas chaves mudaram."""
+        old = self.heap.get(rid)
+        self._check_unique(record, rid)
+        for entry in self.indexes.values():
+            old_key = record_key(old, entry.attr)
+            new_key = record_key(record, entry.attr)
+            if old_key != new_key:
+                entry.discard(old_key, rid)
+                entry.add(new_key, rid)
+        self.heap.update(rid, record)
+
+    def delete(self, rid: int) -> dict:
+        record = self.heap.delete(rid)
+        for entry in self.indexes.values():
+            entry.discard(record_key(record, entry.attr), rid)
+        return record
+
+    def plan(self, attr, lo=None, hi=None) -> Plan:
+        """Escolhe como responder attr entre lo e hi (igualdade quando lo == hi).
+
+        Igualdade: o índice do atributo com a menor preferência em
+        _EQ_PREFERENCE (hash, depois árvore B+, depois ISA). Intervalo: um
+        índice ordenado (árvore B+, depois ISA). Sem índice adequado, scan.
+        """
+        equality = lo is not None and lo == hi
+        preference = _EQ_PREFERENCE if equality else _RANGE_PREFERENCE
+        candidates = [entry for entry in self.indexes.values()
+                      if entry.attr == attr and entry.kind in preference]
+        if not candidates:
+            return Plan("scan", None, attr, lo, hi)
+        best = min(candidates, key=lambda entry: preference[entry.kind])
+        return Plan("eq" if equality else "range", best.name, attr, lo, hi)
+
+    def select(self, attr, lo=None, hi=None, plan: Plan = None):
+        """Pares (RID, registro) com lo <= attr <= hi (None deixa o lado aberto).
+
+        Pelo índice os registros saem em ordem de chave; no scan, em ordem
+        de RID.
+        """
+        if plan is None:
+            plan = self.plan(attr, lo, hi)
+        get = self.heap.get
+        if plan.access == "eq":
+            for rid in self.indexes[plan.index].rids(lo):
+                yield rid, get(rid)
+        elif plan.access == "range":
+            for _, rid in self.indexes[plan.index].range(lo, hi):
+                yield rid, get(rid)
+        else:
+            for rid, record in self.heap.scan():
+                key = record_key(record, attr)
+                if key is None or (lo is not None and key < lo) or (hi is not None and key > hi):
+                    continue
+                yield rid, record
+
+    def find(self, attr, value) -> list:
+        """Registros com attr == value."""
+        return [record for _, record in self.select(attr, value, value)]
+
+    def stats(self) -> dict:
+        return {
+            "heap": self.heap.stats(),
+            "indexes": {name: dict(entry.index.stats(), kind=entry.kind, attr=entry.attr,
+                                   unique=entry.unique)
+                        for name, entry in self.indexes.items()},
+        }
+
+
+def _traced(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def main():
+    """Memória de índices sobre o heap (RIDs) x estruturas com o registro inteiro, e planos."""
+    parser = argparse.ArgumentParser(description="Tabela com heap de registros e índices secundários")
+    parser.add_argument("-n", type=int, default=50_000, help="quantidade de registros")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cities = [f"cidade-{i:03d}" for i in range(200)]
+    records = [{"id": i, "email": f"user{i}@exemplo.com", "city": rng.choice(cities),
+                "age": rng.randrange(18, 90), "bio": "x" * rng.randrange(50, 200)}
+               for i in range(args.n)]
+
+    def build_table():
+        table = Table()
+        table.create_index("pk", "id", "bplustree", primary=True)
+        table.create_index("email", "email", "hash", unique=True)
+        table.create_index("city", "city", "hash")
+        table.create_index("age", "age", "bplustree")
+        for record in records:
+            table.insert(dict(record))
+        return table
+
+    def build_inline():
+        # cada estrutura com cópias dos registros como valor (lista nos não unique)
+        indexes = [make_index("bplustree"), make_index("hash"), make_index("hash"), make_index("bplustree")]
+        for record in records:
+            for index, attr, unique in zip(indexes, ("id", "email", "city", "age"), (True, True, False, False)):
+                if unique:
+                    index.insert(record[attr], dict(record))
+                    continue
+                stored = index.search(record[attr])
+                if stored is None:
+                    index.insert(record[attr], [dict(record)])
+                else:
+                    stored.append(dict(record))
+        return indexes
+
+    table, table_bytes = _traced(build_table)
+    _, inline_bytes = _traced(build_inline)
+    print(f"n = {args.n} registros, 4 índices")
+    print(f"heap + índices de RIDs: {table_bytes / 1024:10.0f} KiB")
+    print(f"registros nos índices:  {inline_bytes / 1024:10.0f} KiB")
+
+    for attr, lo, hi in (("id", 42, 42), ("email", "user7@exemplo.com", "user7@exemplo.com"),
+                         ("city", "cidade-007", "cidade-007"), ("age", 30, 35), ("bio", None, None)):
+        plan = table.plan(attr, lo, hi)
+        rows = sum(1 for _ in table.select(attr, lo, hi, plan))
+        print(f"{attr:>6}: {plan.access:>5} via {plan.index or 'heap'} ({rows} registros)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import bisect
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from itertools import accumulate
+
+from Index import STRUCTURES, make_index
+
+# Benchmark comparativo das três estruturas, sem interação: cada estrutura
+# é carregada com n chaves e então recebe cada carga de trabalho (sobre um
+# índice recém-carregado). O resultado sai em JSON, com ops/s, percentis
+# de latência por operação, pico de memória da carga (tracemalloc) e as
+# estatísticas estruturais de cada índice (com --cache, também acertos e
+# descartes da cache de leitura).
+#
+# As chaves carregadas são os pares 0, 2, ..., 2(n-1): buscas uniformes e
+# zipfianas acertam, inserções uniformes caem metade em chaves novas
+# (ímpares) e metade em atualizações, e a distribuição sequencial insere
+# depois da maior chave.
+
+# carga -> (distribuição das chaves, proporção de cada operação)
+WORKLOADS = {
+    "uniform": ("uniform", {"search": 1.0}),
+    "zipfian": ("zipfian", {"search": 1.0}),
+    "sequential": ("sequential", {"insert": 1.0}),
+    "read-heavy": ("zipfian", {"search": 0.95, "insert": 0.05}),
+    "mixed": ("uniform", {"search": 0.5, "insert": 0.5}),
+    "write-heavy": ("uniform", {"search": 0.1, "insert": 0.6, "remove": 0.3}),
+    "range-heavy": ("uniform", {"range": 0.8, "search": 0.2}),
+}
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class KeyGenerator:
+    def __init__(self, n, dist, rng, zipf_s):
+        self.n = n
+        self.dist = dist
+        self.rng = rng
+        self.next_sequential = 2 * n
+        if dist == "zipfian":
+            # rank -> chave embaralhado, para as chaves quentes não serem as menores
+            self.hot = list(range(0, 2 * n, 2))
+            rng.shuffle(self.hot)
+            self.cdf = list(accumulate(1 / (rank ** zipf_s) for rank in range(1, n + 1)))
+
+    def existing(self):
+        if self.dist == "zipfian":
+            rank = bisect.bisect_left(self.cdf, self.rng.random() * self.cdf[-1])
+            return self.hot[min(rank, self.n - 1)]
+        return 2 * self.rng.randrange(self.n)
+
+    def any(self):
+        if self.dist == "sequential":
+            key = self.next_sequential
+            self.next_sequential += 1
+            return key
+        if self.dist == "zipfian":
+            return self.existing()
+        return self.rng.randrange(2 * self.n)
+
+
+def generate_ops(workload, n, ops, rng, zipf_s, range_len):
+    """Gera as operações antes da medição: lista de (operação, a, b)."""
+    dist, mix = WORKLOADS[workload]
+    keys = KeyGenerator(n, dist, rng, zipf_s)
+    names = list(mix)
+    cum_weights = list(accumulate(mix[name] for name in names))
+    result = []
+    for op in rng.choices(names, cum_weights=cum_weights, k=ops):
+        if op == "search":
+            result.append((op, keys.existing(), None))
+        elif op == "insert":
+            key = keys.any()
+            result.append((op, key, key))
+        elif op == "remove":
+            result.append((op, keys.any(), None))
+        else:
+            lo = keys.existing()
+            result.append((op, lo, lo + 2 * range_len))
+    return result
+
+
+def run_ops(index, ops):
+    """Executa as operações medindo cada uma; retorna (segundos, latências em ns por operação)."""
+    search, insert, remove, range_ = index.search, index.insert, index.remove, index.range
+    latencies = {}
+    clock = time.perf_counter_ns
+    start = clock()
+    for op, a, b in ops:
+        t0 = clock()
+        if op == "search":
+            search(a)
+        elif op == "insert":
+            insert(a, b)
+        elif op == "remove":
+            remove(a)
+        else:
+            deque(range_(a, b), maxlen=0)
+        elapsed = clock() - t0
+        latencies.setdefault(op, []).append(elapsed)
+    return (clock() - start) / 1e9, latencies
+
+
+def summarize(latencies_ns):
+    data = sorted(latencies_ns)
+    n = len(data)
+    summary = {"count": n, "mean_us": sum(data) / n / 1e3}
+    for p in PERCENTILES:
+        summary[f"p{p}_us"] = data[min(n - 1, int(n * p / 100))] / 1e3
+    summary["max_us"] = data[-1] / 1e3
+    return summary
+
+
+def build(kind, options, n, rng):
+    keys = list(range(0, 2 * n, 2))
+    rng.shuffle(keys)
+    index = make_index(kind, **options)
+    start = time.perf_counter()
+    for key in keys:
+        index.insert(key, key)
+    return index, time.perf_counter() - start
+
+
+def measure_memory(kind, options, n, seed):
+    tracemalloc.start()
+    try:
+        index, _ = build(kind, options, n, random.Random(seed))
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return index, {"current_bytes": current, "peak_bytes": peak, "bytes_per_key": current / max(1, n)}
+
+
+def run(structures, workloads, n, ops, seed, options, zipf_s, range_len):
+    results = []
+    for kind in structures:
+        index, memory = measure_memory(kind, options, n, seed)
+        entry = {"structure": kind, "memory": memory, "stats": index.stats(), "workloads": {}}
+        del index
+        for workload in workloads:
+            rng = random.Random(seed)
+            index, build_seconds = build(kind, options, n, rng)
+            workload_ops = generate_ops(workload, n, ops, rng, zipf_s, range_len)
+            seconds, latencies = run_ops(index, workload_ops)
+            all_latencies = [lat for per_op in latencies.values() for lat in per_op]
+            entry["workloads"][workload] = {
+                "build_ops_per_sec": n / build_seconds,
+                "ops": ops,
+                "seconds": seconds,
+                "ops_per_sec": ops / seconds,
+                "latency": summarize(all_latencies),
+                "latency_by_op": {op: summarize(lat) for op, lat in latencies.items()},
+                "stats_after": index.stats(),
+            }
+        results.append(entry)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark comparativo dos índices (saída em JSON)")
+    parser.add_argument("-n", type=int, default=100_000, help="chaves carregadas antes de cada carga")
+    parser.add_argument("--ops", type=int, default=50_000, help="operações por carga de trabalho")
+    parser.add_argument("--structures", default=",".join(STRUCTURES),
+                        help=f"estruturas separadas por vírgula ({', '.join(STRUCTURES)})")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"cargas separadas por vírgula ({', '.join(WORKLOADS)})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--order", type=int, default=64, help="ordem da árvore B+")
+    parser.add_argument("--compact", action="store_true", help="árvore B+ no modo compacto")
+    parser.add_argument("--bucket-size", type=int, default=64, help="tamanho do bucket do hash")
+    parser.add_argument("--balance", default="avl", help="balanceamento da árvore ISA (bst, avl, treap)")
+    parser.add_argument("--cache", choices=("lru", "clock", "2q", "arc"),
+                        help="cache de leitura na frente de cada índice (CachedIndex)")
+    parser.add_argument("--cache-size", type=int, default=10_000, help="chaves na cache")
+    parser.add_argument("--instrument", action="store_true",
+                        help="liga contadores e cronômetros (entram em stats_after)")
+    parser.add_argument("--zipf-s", type=float, default=0.99, help="expoente da distribuição zipfiana")
+    parser.add_argument("--range-len", type=int, default=100, help="chaves cobertas por consulta de intervalo")
+    parser.add_argument("--output", help="arquivo de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    structures = args.structures.split(",")
+    workloads = args.workloads.split(",")
+    for name in structures:
+        if name not in STRUCTURES:
+            parser.error(f"estrutura desconhecida: {name}")
+    for name in workloads:
+        if name not in WORKLOADS:
+            parser.error(f"carga de trabalho desconhecida: {name}")
+
+    options = {
+        "order": args.order,
+        "compact": args.compact,
+        "bucket_size": args.bucket_size,
+        "balance": None if args.balance == "bst" else args.balance,
+        "seed": args.seed,
+        "cache": args.cache,
+        "cache_size": args.cache_size,
+        "instrument": args.instrument,
+    }
+    report = {
+        "config": {
+            "n": args.n,
+            "ops": args.ops,
+            "seed": args.seed,
+            "zipf_s": args.zipf_s,
+            "range_len": args.range_len,
+            "options": options,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "workload_definitions": {name: {"distribution": dist, "mix": mix}
+                                 for name, (dist, mix) in WORKLOADS.items() if name in workloads},
+        "results": run(structures, workloads, args.n, args.ops, args.seed, options,
+                       args.zipf_s, args.range_len),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
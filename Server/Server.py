@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Index"))
+
+from Index import STRUCTURES, make_index  # noqa: E402
+from Metrics import to_prometheus_many  # noqa: E402
+
+# Protocolo: uma requisição JSON por linha, uma resposta JSON por linha,
+# na mesma ordem das requisições (o cliente pode enviar várias sem esperar
+# as respostas). Requisição: [comando, argumentos...]. Resposta:
+# ["ok", resultado] ou ["error", mensagem].
+#
+#   ["ping"]                             -> "pong"
+#   ["list"]                             -> {nome: estrutura}
+#   ["create", nome, estrutura, {opções}] -> null   (opções de make_index)
+#   ["drop", nome]                       -> bool
+#   ["get", nome, chave]                 -> valor ou null
+#   ["mget", nome, [chaves]]             -> [valores]
+#   ["range", nome, lo, hi, limite]      -> [[chave, valor], ...]
+#   ["stats", nome]                      -> dicionário de estatísticas
+#   ["metrics"]                          -> texto Prometheus de todos os índices
+#   ["put", nome, chave, valor]          -> null
+#   ["mput", nome, [[chave, valor], ...]] -> quantidade inserida
+#   ["del", nome, chave]                 -> bool
+#
+# Comandos de escrita entram na fila da tarefa escritora, que aplica um lote
+# de cada vez; leituras são respondidas direto pela conexão, sem esperar a
+# fila. Dentro de uma conexão, uma leitura depois de uma escrita ainda
+# pendente entra na mesma fila, atrás dela, e a escritora a executa na sua
+# vez: a leitura vê as escritas anteriores da conexão e nenhuma posterior.
+READS = {"ping", "list", "get", "mget", "range", "stats", "metrics"}
+WRITES = {"create", "drop", "put", "mput", "del"}
+MAX_LINE = 16 * 1024 * 1024
+
+
+class IndexServer:
+    def __init__(self):
+        self.indexes = {}
+        self.kinds = {}
+        self.requests = 0
+        self.write_batches = 0
+        self._writes = None
+        self._writer_task = None
+
+    def _index(self, name):
+        try:
+            return self.indexes[name]
+        except KeyError:
+            raise KeyError(f"índice inexistente: {name}") from None
+
+    def _read(self, command, args):
+        if command == "ping":
+            return "pong"
+        if command == "list":
+            return dict(self.kinds)
+        if command == "metrics":
+            return to_prometheus_many(({"index": name, "structure": self.kinds[name]}, index.stats())
+                                      for name, index in self.indexes.items())
+        index = self._index(args[0])
+        if command == "get":
+            return index.search(args[1])
+        if command == "mget":
+            return index.search_many(args[1])
+        if command == "range":
+            lo, hi = args[1], args[2]
+            limit = args[3] if len(args) > 3 else None
+            result = []
+            for pair in index.range(lo, hi):
+                if limit is not None and len(result) >= limit:
+                    break
+                result.append(list(pair))
+            return result
+        return index.stats()
+
+    def _write(self, command, args):
+        if command == "create":
+            name, kind = args[0], args[1]
+            if name in self.indexes:
+                raise ValueError(f"índice já existe: {name}")
+            self.indexes[name] = make_index(kind, **(args[2] if len(args) > 2 else {}))
+            self.kinds[name] = kind
+            return None
+        if command == "drop":
+            self.kinds.pop(args[0], None)
+            return self.indexes.pop(args[0], None) is not None
+        index = self._index(args[0])
+        if command == "put":
+            index.insert(args[1], args[2])
+            return None
+        if command == "mput":
+            index.insert_many(args[1])
+            return len(args[1])
+        return index.remove(args[1])
+
+    async def _writer(self):
+        """Aplica as escritas na ordem de chegada, um lote (o que estiver na fila) por vez.
+
+        Leituras enfileiradas atrás de uma escrita são executadas no meio do
+        lote, na posição em que chegaram.
+        """
+        while True:
+            batch = [await self._writes.get()]
+            while not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            self.write_batches += 1
+            for command, args, future in batch:
+                if future.cancelled():
+                    continue
+                if command in READS:
+                    future.set_result(self._run_read(command, args))
+                    continue
+                try:
+                    future.set_result(["ok", self._write(command, args)])
+                except Exception as e:
+                    future.set_result(["error", f"{type(e).__name__}: {e}"])
+
+    def _run_read(self, command, args):
+        try:
+            return ["ok", self._read(command, args)]
+        except Exception as e:
+            return ["error", f"{type(e).__name__}: {e}"]
+
+    def _dispatch(self, line, last_write):
+        """Futuro com a resposta da linha e o futuro da última requisição da conexão na fila da escritora."""
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+        try:
+            request = json.loads(line)
+            if not (isinstance(request, list) and request and isinstance(request[0], str)):
+                raise ValueError("requisição inválida")
+            command, args = request[0], request[1:]
+        except (ValueError, TypeError):
+            future = loop.create_future()
+            future.set_result(["error", "requisição inválida"])
+            return future, last_write
+
+        if command in WRITES:
+            future = loop.create_future()
+            self._writes.put_nowait((command, args, future))
+            return future, future
+        if command not in READS:
+            future = loop.create_future()
+            future.set_result(["error", f"comando desconhecido: {command}"])
+            return future, last_write
+        if last_write is not None and not last_write.done():
+            # depende de uma escrita ainda na fila: vai para a fila atrás dela,
+            # para não ver escritas que a conexão mandou depois
+            future = loop.create_future()
+            self._writes.put_nowait((command, args, future))
+            return future, future
+        future = loop.create_future()
+        future.set_result(self._run_read(command, args))
+        return future, last_write
+
+    async def _handle(self, reader, writer):
+        responses = asyncio.Queue()
+
+        async def send():
+            while True:
+                future = await responses.get()
+                if future is None:
+                    break
+                writer.write(json.dumps(await future).encode() + b"\n")
+                # junta as respostas prontas de um pipeline num único drain
+                if responses.empty():
+                    await writer.drain()
+
+        sender = asyncio.ensure_future(send())
+        last_write = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    future, last_write = self._dispatch(line, last_write)
+                    responses.put_nowait(future)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            responses.put_nowait(None)
+            try:
+                await sender
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=7878, unix_path=None):
+        """Abre o socket (TCP, ou Unix se unix_path) e inicia a tarefa escritora."""
+        self._writes = asyncio.Queue()
+        self._writer_task = asyncio.ensure_future(self._writer())
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self._handle, unix_path, limit=MAX_LINE)
+        return await asyncio.start_server(self._handle, host, port, limit=MAX_LINE)
+
+
+async def serve(args):
+    server = IndexServer()
+    for spec in args.index:
+        name, _, kind = spec.partition("=")
+        server.indexes[name] = make_index(kind or "bplustree")
+        server.kinds[name] = kind or "bplustree"
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"servindo {len(server.indexes)} índice(s) em {where}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de índices (protocolo JSON por linha)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", help="caminho de um socket Unix (em vez de TCP)")
+    parser.add_argument("--index", action="append", default=[],
+                        help=f"índice criado na partida, nome=estrutura ({', '.join(STRUCTURES)})")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
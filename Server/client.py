@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+
+from Server import MAX_LINE
+
+
+class ServerError(Exception):
+    pass
+
+
+class IndexClient:
+    """Cliente do serviço de índices com pipelining.
+
+    Cada chamada envia a requisição na hora e espera só a própria resposta;
+    várias corrotinas podem usar a mesma conexão ao mesmo tempo, e as
+    respostas (que chegam na ordem de envio) são entregues pela fila.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._pending = deque()
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=7878, unix_path=None):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path, limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                self._pending.popleft().set_result(json.loads(line))
+        finally:
+            while self._pending:
+                self._pending.popleft().set_exception(ConnectionError("conexão encerrada"))
+
+    async def call(self, *request):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._writer.write(json.dumps(request).encode() + b"\n")
+        status, result = await future
+        if status != "ok":
+            raise ServerError(result)
+        return result
+
+    async def create(self, name, kind, **options):
+        return await self.call("create", name, kind, options)
+
+    async def get(self, name, key):
+        return await self.call("get", name, key)
+
+    async def mget(self, name, keys):
+        return await self.call("mget", name, list(keys))
+
+    async def put(self, name, key, value):
+        return await self.call("put", name, key, value)
+
+    async def mput(self, name, pairs):
+        return await self.call("mput", name, [list(p) for p in pairs])
+
+    async def delete(self, name, key):
+        return await self.call("del", name, key)
+
+    async def range(self, name, lo, hi, limit=None):
+        return await self.call("range", name, lo, hi, limit)
+
+    async def stats(self, name):
+        return await self.call("stats", name)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._receiver
+
+
+def _percentile(data, p):
+    return data[min(len(data) - 1, int(len(data) * p / 100))]
+
+
+async def load(args):
+    clients = [await IndexClient.connect(args.host, args.port, args.unix) for _ in range(args.connections)]
+    name = args.name
+    setup = clients[0]
+    try:
+        await setup.call("drop", name)
+        await setup.create(name, args.structure)
+        for start in range(0, args.n, 10_000):
+            await setup.mput(name, [(k, k) for k in range(start, min(args.n, start + 10_000))])
+
+        latencies = []
+        keys_read = [0]
+        per_worker = args.ops // (args.connections * args.pipeline)
+
+        async def worker(client, seed):
+            rng = random.Random(seed)
+            for _ in range(per_worker):
+                t0 = time.perf_counter()
+                if rng.random() < args.writes:
+                    key = rng.randrange(args.n * 2)
+                    await client.put(name, key, key)
+                elif args.batch > 1:
+                    await client.mget(name, [rng.randrange(args.n) for _ in range(args.batch)])
+                    keys_read[0] += args.batch
+                else:
+                    await client.get(name, rng.randrange(args.n))
+                    keys_read[0] += 1
+                latencies.append(time.perf_counter() - t0)
+
+        # pipeline = requisições em voo por conexão
+        workers = [worker(client, args.seed + c * args.pipeline + p)
+                   for c, client in enumerate(clients) for p in range(args.pipeline)]
+        start = time.perf_counter()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - start
+        stats = await setup.stats(name)
+    finally:
+        for client in clients:
+            await client.close()
+
+    latencies.sort()
+    requests = len(latencies)
+    print(f"{args.structure}: {args.connections} conexões x {args.pipeline} em voo, "
+          f"{args.writes:.0%} escritas, lote de leitura {args.batch}")
+    print(f"requisições/s: {requests / elapsed:,.0f}   chaves lidas/s: {keys_read[0] / elapsed:,.0f}")
+    print("latência (µs): " + "  ".join(
+        f"p{p}={_percentile(latencies, p) * 1e6:.0f}" for p in (50, 90, 99, 99.9)
+    ) + f"  max={latencies[-1] * 1e6:.0f}")
+    print(f"estatísticas: {json.dumps(stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga para o serviço de índices")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", help="caminho de um socket Unix (em vez de TCP)")
+    parser.add_argument("--name", default="bench", help="nome do índice criado para o teste")
+    parser.add_argument("--structure", default="bplustree", help="bplustree, hash ou isa")
+    parser.add_argument("-n", type=int, default=100_000, help="chaves carregadas antes da medição")
+    parser.add_argument("--ops", type=int, default=100_000, help="requisições medidas")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--pipeline", type=int, default=16, help="requisições em voo por conexão")
+    parser.add_argument("--writes", type=float, default=0.1, help="fração de escritas")
+    parser.add_argument("--batch", type=int, default=1, help="chaves por leitura (mget quando > 1)")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(load(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
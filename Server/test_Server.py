@@ -0,0 +1,54 @@
+import asyncio
+import json
+import unittest
+
+from Server import IndexServer
+
+
+class PipelineOrderTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = IndexServer()
+        self.listener = await self.server.start(port=0)
+        port = self.listener.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.server._writer_task.cancel()
+
+    async def pipeline(self, *requests):
+        """Envia todas as requisições de uma vez e lê as respostas na ordem."""
+        self.writer.write(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+        await self.writer.drain()
+        return [json.loads(await self.reader.readline()) for _ in requests]
+
+    async def test_read_between_writes_sees_only_earlier_writes(self):
+        responses = await self.pipeline(
+            ["create", "a", "hash"],
+            ["put", "a", 1, "x"],
+            ["get", "a", 1],
+            ["del", "a", 1],
+            ["get", "a", 1],
+        )
+        self.assertEqual(responses[2], ["ok", "x"])
+        self.assertEqual(responses[3], ["ok", True])
+        self.assertEqual(responses[4], ["ok", None])
+
+    async def test_reads_after_queued_read_keep_order(self):
+        responses = await self.pipeline(
+            ["create", "a", "hash"],
+            ["put", "a", 1, "x"],
+            ["get", "a", 1],
+            ["mget", "a", [1, 2]],
+            ["put", "a", 2, "y"],
+            ["mget", "a", [1, 2]],
+        )
+        self.assertEqual(responses[3], ["ok", ["x", None]])
+        self.assertEqual(responses[5], ["ok", ["x", "y"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,252 @@
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+# Registro do log: tamanho (I) + crc32 (I) + pickle de (lsn, operação, chave, valor)
+RECORD_HEADER = struct.Struct("<II")
+SNAPSHOT_MAGIC = b"IDXSNAP1"
+
+
+def _encode_record(lsn, op, key, value):
+    payload = pickle.dumps((lsn, op, key, value), pickle.HIGHEST_PROTOCOL)
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_log(path):
+    """Lê os registros válidos do log.
+
+    Retorna (registros, offset), onde offset é o fim do último registro
+    íntegro: um registro cortado ou corrompido no fim do arquivo (queda
+    no meio de uma escrita) encerra a leitura.
+    """
+    records = []
+    offset = 0
+    if not os.path.exists(path):
+        return records, offset
+    with open(path, "rb") as f:
+        data = f.read()
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(pickle.loads(payload))
+        offset = start + length
+    return records, offset
+
+
+def _fsync_dir(path):
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """Log append-only com group commit.
+
+    append() só coloca o registro no buffer; os registros acumulados são
+    gravados com um único write + fsync por sync(), chamado por uma thread
+    a cada flush_interval segundos. flush_interval=0 faz fsync a cada
+    append; flush_interval=None desliga a thread (sync() manual).
+    """
+
+    def __init__(self, path: str, next_lsn: int = 1, flush_interval=0.01):
+        self.path = path
+        self.file = open(path, "ab")
+        self.flush_interval = flush_interval
+        self.next_lsn = next_lsn
+        self.durable_lsn = next_lsn - 1
+        self.syncs = 0
+        self._buffer = []
+        self._lock = threading.Lock()      # protege buffer e next_lsn
+        self._io_lock = threading.Lock()   # serializa write/fsync
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval:
+            self._thread = threading.Thread(target=self._flusher, daemon=True)
+            self._thread.start()
+
+    def append(self, op: str, key, value=None) -> int:
+        """Adiciona um registro ao log e retorna seu LSN."""
+        with self._lock:
+            lsn = self.next_lsn
+            self.next_lsn += 1
+            self._buffer.append(_encode_record(lsn, op, key, value))
+        if self.flush_interval == 0:
+            self.sync()
+        return lsn
+
+    def sync(self):
+        """Grava e faz fsync de todos os registros pendentes (um fsync por lote)."""
+        with self._io_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                data = b"".join(self._buffer)
+                self._buffer.clear()
+                lsn = self.next_lsn - 1
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.durable_lsn = lsn
+            self.syncs += 1
+
+    def _flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            self.sync()
+
+    def reset(self):
+        """Esvazia o log (depois de um checkpoint que já cobre todos os registros)."""
+        self.sync()
+        with self._io_lock:
+            self.file.close()
+            self.file = open(self.path, "wb")
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sync()
+        self.file.close()
+
+
+class DurableIndex:
+    """Torna durável qualquer um dos índices (BPlusTree, ExtensibleHash, ISATree).
+
+    Cada insert/remove é aplicado ao índice em memória e só então
+    registrado no WAL: uma operação que falha (chave incomparável, valor
+    que não cabe) não entra no log, então não quebra a recuperação. Como o
+    índice só existe em memória, a ordem não muda a durabilidade: depois
+    de uma queda vale o que o log tiver gravado (sync/commit). A cada
+    checkpoint_every operações o índice inteiro é
+    gravado em um snapshot e o log é esvaziado, então a recuperação lê o
+    snapshot e reaplica no máximo checkpoint_every registros.
+    """
+
+    def __init__(self, index_factory, directory: str, flush_interval=0.01, checkpoint_every: int = 100_000):
+        os.makedirs(directory, exist_ok=True)
+        self.index_factory = index_factory
+        self.log_path = os.path.join(directory, "index.wal")
+        self.snapshot_path = os.path.join(directory, "index.snapshot")
+        self.checkpoint_every = checkpoint_every
+        self._ops_since_checkpoint = 0
+
+        self.index, last_lsn = self._recover()
+        self.wal = WriteAheadLog(self.log_path, last_lsn + 1, flush_interval)
+
+    def _recover(self):
+        index = self.index_factory()
+        snapshot_lsn = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    raise ValueError(f"snapshot inválido: {self.snapshot_path}")
+                snapshot_lsn = pickle.load(f)
+                while True:
+                    try:
+                        batch = pickle.load(f)
+                    except EOFError:
+                        break
+                    for key, value in batch:
+                        index.insert(key, value)
+
+        records, good_offset = read_log(self.log_path)
+        last_lsn = snapshot_lsn
+        replayed = 0
+        for lsn, op, key, value in records:
+            if lsn <= snapshot_lsn:
+                continue  # já está no snapshot (queda entre o snapshot e o truncamento do log)
+            self._apply(index, op, key, value)
+            last_lsn = lsn
+            replayed += 1
+        self._ops_since_checkpoint = replayed
+
+        # descarta um registro incompleto no fim do log
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > good_offset:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(good_offset)
+                os.fsync(f.fileno())
+        return index, last_lsn
+
+    @staticmethod
+    def _apply(index, op, key, value):
+        if op == "insert":
+            index.insert(key, value)
+        elif op == "remove":
+            return index.remove(key)
+        else:
+            raise ValueError(f"operação desconhecida no log: {op}")
+
+    def insert(self, key, value):
+        self.index.insert(key, value)
+        self.wal.append("insert", key, value)
+        self._maybe_checkpoint()
+
+    def remove(self, key):
+        result = self.index.remove(key)
+        self.wal.append("remove", key)
+        self._maybe_checkpoint()
+        return result
+
+    def search(self, key):
+        return self.index.search(key)
+
+    def commit(self):
+        """Força a durabilidade de tudo o que já foi executado."""
+        self.wal.sync()
+
+    def _maybe_checkpoint(self):
+        self._ops_since_checkpoint += 1
+        if self.checkpoint_every and self._ops_since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def _snapshot_pairs(self):
+        multi_value = getattr(self.index, "multi_value", False)
+        for key, value in self.index.items():
+            if multi_value:
+                for v in value:
+                    yield key, v
+            else:
+                yield key, value
+
+    def checkpoint(self, batch_size: int = 4096):
+        """Grava o snapshot do índice (arquivo temporário + rename) e esvazia o log."""
+        self.wal.sync()
+        lsn = self.wal.next_lsn - 1
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            pickle.dump(lsn, f)
+            batch = []
+            for pair in self._snapshot_pairs():
+                batch.append(pair)
+                if len(batch) >= batch_size:
+                    pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+                    batch = []
+            if batch:
+                pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.snapshot_path)
+        # o snapshot já cobre tudo até lsn; se cair antes do reset, a
+        # recuperação ignora os registros com lsn <= lsn do snapshot
+        self.wal.reset()
+        self._ops_since_checkpoint = 0
+
+    def close(self):
+        self.wal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()